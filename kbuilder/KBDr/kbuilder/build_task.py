@@ -39,24 +39,31 @@ class kBuilderTask(TaskBase):
     async def pull_from_kcache(self, kcache_key: str):
         await self.report_job_log('Pulling source from kcache')
 
-        kcache_local_path = os.path.join(self.cwd, KCACHE_FILENAME)
-        await self.storage_backend.download_resource(kcache_key, kcache_local_path)
-
         checkout_path = os.path.join(self.cwd, 'linux')
-        await run_async(os.makedirs, checkout_path)
+        os.makedirs(checkout_path)
 
-        # untar;
+        # untar while downloading, the archive never touches the disk;
         proc = await asp.create_subprocess_exec(
             'tar', '-x', '--use-compress-program=zstdmt',
-            '-f', kcache_local_path, '-C', checkout_path,
-            stdin=asp.DEVNULL, stdout=asp.DEVNULL, stderr=asp.DEVNULL
+            '-f', '-', '-C', checkout_path,
+            stdin=asp.PIPE, stdout=asp.DEVNULL, stderr=asp.DEVNULL
         )
+        try:
+            async for chunk in self.storage_backend.download_resource_stream(kcache_key):
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+            proc.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # tar quit early, its exit code tells why;
+            pass
+        except BaseException:
+            proc.kill()
+            await proc.wait()
+            raise
         code = await proc.wait()
         if code != 0:
             raise JobExceptionError('kbuilder.KcacheUntarError', f'Failed to untar the {KCACHE_FILENAME}')
 
-        # delete the kcache;
-        await run_async(os.remove, kcache_local_path)
         return checkout_path
 
     async def pull(self):
@@ -110,7 +117,7 @@ class kBuilderTask(TaskBase):
         # tar;
         # remove the .git;
         git_folder_path = os.path.join(checkout_path, '.git')
-        if os.path.exists(git_folder_path) and os.path.isdir(git_folder_path):
+        if os.path.isdir(git_folder_path):
             await run_async(shutil.rmtree, git_folder_path)
         await self.report_job_log('Building kcache')
         proc = await asp.create_subprocess_exec(
@@ -130,7 +137,8 @@ class kBuilderTask(TaskBase):
     async def on_task(self) -> kBuilderResult:
         self.result_lock = asyncio.Lock()
         self.pending_result = kBuilderResult()
-        self.argument = kBuilderArgument.model_validate(self.argument.model_dump())
+        # the fields are plain JSON values already, a shallow dict is enough;
+        self.argument = kBuilderArgument.model_validate(dict(self.argument))
         self.pending_result.compilationTime = 0
 
         self.repositories_path = os.environ['KBUILDER_KERNEL_REPO_PATH']
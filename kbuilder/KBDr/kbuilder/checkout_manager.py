@@ -13,7 +13,7 @@ class CheckoutManager:
 
     async def clone_and_checkout(self, local_repo_path: str, remote_repo_url: str, commit_id: str):
         # clean up the potential unfinished checkout;
-        if await run_async(os.path.exists, self.checkout_path):
+        if os.path.exists(self.checkout_path):
             await run_async(shutil.rmtree, self.checkout_path)
         # clone repo;
         await self.task.report_job_log('Cloning from cached repository')
@@ -170,11 +170,11 @@ class CheckoutManager:
 
     async def ensure_reproducible(self):
         gcc_plugin_path = os.path.join(self.checkout_path, 'scripts', 'gcc-plugins')
-        if await run_async(os.path.exists, gcc_plugin_path):
+        if os.path.exists(gcc_plugin_path):
             async with aiofiles.open(os.path.join(gcc_plugin_path, 'randomize_layout_seed.h'), 'w') as fp:
                 await fp.write(KERNEL_SEED)
 
         certs_path = os.path.join(self.checkout_path, 'certs')
-        if await run_async(os.path.exists, certs_path):
+        if os.path.exists(certs_path):
             async with aiofiles.open(os.path.join(certs_path, 'signing_key.pem'), 'w') as fp:
                 await fp.write(KERNEL_MODULE_SIGNING_KEY)
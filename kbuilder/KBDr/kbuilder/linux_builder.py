@@ -255,7 +255,7 @@ class LinuxBuilder:
         kernel_embedded = False
         for image_name in ["boot/vmlinuz", "boot/bzImage", "vmlinuz", "bzImage", "Image.gz"]:
             target_place = os.path.join(self.mount_point, image_name)
-            if await run_async(os.path.exists, target_place):
+            if os.path.exists(target_place):
                 await run_async(shutil.copy, kernel_image_path, target_place)
                 kernel_embedded = True
                 break
@@ -294,7 +294,7 @@ class LinuxBuilder:
         ]
         for p in script_path:
             full_path = os.path.join(self.checkout_path, p)
-            if not await run_async(os.path.exists, full_path):
+            if not os.path.exists(full_path):
                 continue
             proc = await asp.create_subprocess_exec(
                 'python3', p, cwd=self.checkout_path,
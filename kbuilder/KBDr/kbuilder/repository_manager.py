@@ -25,7 +25,7 @@ class RepositoryManager:
             await fp.write(json.dumps(self.repos))
 
     async def load_local_repository_list(self):
-        if not await run_async(os.path.exists, self.repo_metadata_fname):
+        if not os.path.exists(self.repo_metadata_fname):
             # create when non-existing;
             self.repos = dict()
             await self.save_local_repository_list()
@@ -51,7 +51,7 @@ class RepositoryManager:
         await self.task.report_job_log(f'Cloning bare repository \"{git_url}\" to \"{local_name}\"')
 
         # clean up the potential unfinished clone;
-        if await run_async(os.path.exists, local_path):
+        if os.path.exists(local_path):
             await run_async(shutil.rmtree, local_path)
 
         code = await ((await asp.create_subprocess_exec(
@@ -164,6 +164,25 @@ class kGymAsyncClient:
         response.raise_for_status()
         return JobId(response.json())
 
+    async def create_jobs(self, job_requests: List[JobRequest]) -> List[JobId]:
+        """Submit several jobs to the scheduler in one request.
+
+        Args:
+            job_requests: JobRequests to submit, in order
+
+        Returns:
+            List[JobId]: Job identifiers in the order of the requests
+
+        Example:
+            >>> job_ids = await client.create_jobs([req_a, req_b])
+        """
+        response = await self._client.post(
+            "/newJobs",
+            json=[job_request.model_dump() for job_request in job_requests]
+        )
+        response.raise_for_status()
+        return [JobId(job_id) for job_id in response.json()]
+
     async def abort_job(self, job_id: JobId) -> None:
         """Abort a running or pending job.
 
@@ -467,6 +486,14 @@ class kGymClient:
         response.raise_for_status()
         return JobId(response.json())
 
+    def create_jobs(self, job_requests: List[JobRequest]) -> List[JobId]:
+        response = self._client.post(
+            "/newJobs",
+            json=[job_request.model_dump() for job_request in job_requests]
+        )
+        response.raise_for_status()
+        return [JobId(job_id) for job_id in response.json()]
+
     def abort_job(self, job_id: JobId) -> None:
         response =  self._client.post(f"/jobs/{job_id}/abort")
         response.raise_for_status()
@@ -5,8 +5,8 @@ It extends the core kcore models with specific worker types to enable proper
 type checking and serialization for kbuilder, kvmmanager, and kprebuilder workers.
 
 Type Aliases:
-    kJobWorker: Union type for all worker types with results
-    kJobArgument: Union type for all worker argument types
+    kJobWorker: Union type for all worker types with results, tagged on workerType
+    kJobArgument: Union type for all worker argument types, tagged on workerType
 
 Classes:
     kJobContext: Extended JobContext with typed worker results
@@ -47,7 +47,7 @@ Example:
     ... )
 """
 
-from typing import Union
+from typing import Annotated, Any, Union
 
 from ..kclient_models.kbuilder import *
 from ..kclient_models.kvmmanager import *
@@ -55,10 +55,30 @@ from ..kclient_models.kprebuilder import *
 
 from KBDr.kcore.models import JobRequest, JobContext, JobWorker, JobArgument
 
-from pydantic import SerializeAsAny
-
-kJobWorker = Union[kBuilderWorker, kPreBuilderWorker, kVMManagerWorker, SerializeAsAny[JobWorker]]
-kJobArgument = Union[kBuilderArgument, kPreBuilderArgument, kVMManagerArgument, SerializeAsAny[JobArgument]]
+from pydantic import SerializeAsAny, Discriminator, Tag
+
+_KNOWN_WORKER_TYPES = frozenset(('kbuilder', 'kprebuilder', 'kvmmanager'))
+
+def _worker_type_tag(value: Any) -> str:
+    """Dispatches on ``workerType``; unknown workers fall back to the generic models."""
+    if isinstance(value, dict):
+        worker_type = value.get('workerType')
+    else:
+        worker_type = getattr(value, 'workerType', None)
+    return worker_type if worker_type in _KNOWN_WORKER_TYPES else 'generic'
+
+kJobWorker = Annotated[Union[
+    Annotated[kBuilderWorker, Tag('kbuilder')],
+    Annotated[kPreBuilderWorker, Tag('kprebuilder')],
+    Annotated[kVMManagerWorker, Tag('kvmmanager')],
+    Annotated[SerializeAsAny[JobWorker], Tag('generic')]
+], Discriminator(_worker_type_tag)]
+kJobArgument = Annotated[Union[
+    Annotated[kBuilderArgument, Tag('kbuilder')],
+    Annotated[kPreBuilderArgument, Tag('kprebuilder')],
+    Annotated[kVMManagerArgument, Tag('kvmmanager')],
+    Annotated[SerializeAsAny[JobArgument], Tag('generic')]
+], Discriminator(_worker_type_tag)]
 
 class kJobContext(JobContext):
     """Extended job context with typed worker results.
@@ -32,10 +32,13 @@ Example:
     >>> job_id = client.create_job(job)
 """
 
-from typing import Literal
+from typing import Literal, TYPE_CHECKING
 from KBDr import kcore
 from pydantic import BaseModel, Field
 
+if TYPE_CHECKING:
+    from ..kclient.kgym_dataset import SyzbotData
+
 class KernelGitCommit(BaseModel):
     """Specification for building a kernel from a git repository.
 
@@ -145,8 +148,6 @@ class kBuilderArgument(kcore.JobArgument):
             ValueError: If required fields are missing or invalid
             IndexError: If crash_index is out of bounds
         """
-        from ..kclient.kgym_dataset import SyzbotData
-
         ARCH_MAP = {
             'amd64': 'amd64',
             'i386': '386',
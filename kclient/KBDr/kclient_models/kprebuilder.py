@@ -38,18 +38,23 @@ Example:
 
 from typing import Literal, List
 from enum import Enum
+from hashlib import blake2b
 from KBDr import kcore
-from pydantic import BaseModel, RootModel, ConfigDict, Field
+from pydantic import BaseModel, RootModel, ConfigDict, Field, model_validator
 
 class kPreBuilderArgument(kcore.JobArgument):
     """Input arguments for kprebuilder worker.
 
-    Specifies kernel cache and patches to test for applicability.
+    Specifies kernel cache and patches to test for applicability. Patches are
+    given either inline or as references to patches already in storage; the
+    storage keys are content-addressed (see ``patch_key``), so identical
+    patches share one object across jobs.
 
     Attributes:
         workerType: Always 'kprebuilder'
         kCache: Reference to cached kernel build from kbuilder
         patches: List of patch strings (unified diff format) to test
+        patchRefs: List of stored patches to test, used instead of patches
 
     Example:
         >>> arg = kPreBuilderArgument(
@@ -64,7 +69,43 @@ class kPreBuilderArgument(kcore.JobArgument):
     workerType: Literal['kprebuilder']=Field(default='kprebuilder')
 
     kCache: kcore.JobResource
-    patches: List[str]
+    patches: List[str]=Field(default_factory=list)
+    patchRefs: List[kcore.JobResource] | None=None
+
+    @model_validator(mode='after')
+    def _check_patch_source(self) -> 'kPreBuilderArgument':
+        if self.patchRefs is not None and len(self.patches) != 0:
+            raise ValueError('patches and patchRefs are mutually exclusive')
+        return self
+
+    @staticmethod
+    def patch_digest(patch: str) -> str:
+        """Content hash of a patch.
+
+        Args:
+            patch: Patch string (unified diff format)
+
+        Returns:
+            Hex digest identifying the patch content
+        """
+        return blake2b(patch.encode('utf-8'), digest_size=16).hexdigest()
+
+    @staticmethod
+    def patch_key(patch: str) -> str:
+        """Content-addressed storage key for a patch.
+
+        Args:
+            patch: Patch string (unified diff format)
+
+        Returns:
+            Storage key under which the patch should be stored for patchRefs
+
+        Example:
+            >>> key = kPreBuilderArgument.patch_key(patch)
+            >>> # upload the patch to `key`, then reference it:
+            >>> arg = kPreBuilderArgument(kCache=kcache, patchRefs=[patch_resource])
+        """
+        return f'patches/{kPreBuilderArgument.patch_digest(patch)}.patch'
 
 class PatchResultStatus(str, Enum):
     """Status of patch application attempt.
@@ -33,9 +33,13 @@ Example:
     >>> job_id = client.create_job(job)
 """
 
-from typing import Literal, List, Optional
+from typing import Annotated, Literal, List, Optional, TYPE_CHECKING
 from KBDr import kcore
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+if TYPE_CHECKING:
+    from .kbuilder import kBuilderResult
+    from ..kclient.kgym_dataset import SyzbotData
 
 class Reproducer(BaseModel):
     """Crash reproducer configuration.
@@ -111,13 +115,18 @@ class Image(BaseModel):
         Returns:
             Image specification extracted from result
 
+        Raises:
+            ValueError: If the result carries no image, vmlinux, or architecture
+
         Example:
             >>> ctx = client.get_job(job_id)
             >>> builder_result = ctx.jobWorkers[0].workerResult
             >>> image = Image.model_from_kbuilder_result(builder_result)
         """
-        from .kbuilder import kBuilderResult
-        return cls(
+        if result.vmImage is None or result.vmlinux is None or result.kernelArch is None:
+            raise ValueError('kbuilder result carries no complete image')
+        # the result is a validated model already, skip revalidation;
+        return cls.model_construct(
             vmImage=result.vmImage,
             vmlinux=result.vmlinux,
             arch=result.kernelArch
@@ -146,7 +155,8 @@ class kVMManagerArgument(kcore.JobArgument):
     workerType: Literal['kvmmanager']='kvmmanager'
 
     reproducer: Reproducer
-    image: Image | int
+    # int first: worker indices are the common case and fail fast;
+    image: Annotated[int | Image, Field(union_mode='left_to_right')]
     machineType: str='gce:e2-standard-2'
 
     @classmethod
@@ -185,9 +195,6 @@ class kVMManagerArgument(kcore.JobArgument):
             ValueError: If required fields are missing or invalid
             IndexError: If crash_index is out of bounds
         """
-        from ..kclient.kgym_dataset import SyzbotData
-        from typing import Optional
-
         if not syzbot_data.crashes:
             raise ValueError(f'No crashes found in bug {syzbot_data.bugId}')
 
@@ -233,8 +240,8 @@ class kVMManagerArgument(kcore.JobArgument):
             nInstance=ninstance
         )
 
-        # Create kVMManagerArgument
-        return cls(
+        # Create kVMManagerArgument; the parts are validated already
+        return cls.model_construct(
             reproducer=reproducer,
             image=image,
             machineType=machine_type
@@ -1,30 +1,47 @@
 import subprocess as sp
-import os, json
-from hashlib import md5
+import os, json, threading
 
-urls = ['https://git.kernel.org/pub/scm/linux/kernel/git/bpf/bpf.git',
-    'https://git.kernel.org/pub/scm/linux/kernel/git/davem/net.git',
-    'https://git.kernel.org/pub/scm/linux/kernel/git/torvalds/linux.git',
-    'https://git.kernel.org/pub/scm/linux/kernel/git/bpf/bpf-next.git',
-    'https://git.kernel.org/pub/scm/linux/kernel/git/davem/net-next.git',
-    'https://git.kernel.org/pub/scm/linux/kernel/git/next/linux-next.git'
-]
+# md5 of each url, the naming scheme used by kbuilder's RepositoryManager;
+REPO_NAMES: dict[str, str] = {
+    'https://git.kernel.org/pub/scm/linux/kernel/git/bpf/bpf.git': '7df2c4427123ecb6bb7ec884ed0fe783',
+    'https://git.kernel.org/pub/scm/linux/kernel/git/davem/net.git': 'f6561266e0131a2a4095f8bd89e61b93',
+    'https://git.kernel.org/pub/scm/linux/kernel/git/torvalds/linux.git': 'e71a63241306391efe02153429bf8b33',
+    'https://git.kernel.org/pub/scm/linux/kernel/git/bpf/bpf-next.git': '2a6f087ba3e1590241b9963cee85f91d',
+    'https://git.kernel.org/pub/scm/linux/kernel/git/davem/net-next.git': '4d1bc005a582d35085327b0fd6563751',
+    'https://git.kernel.org/pub/scm/linux/kernel/git/next/linux-next.git': '9dde1612183296d33688732627b9efc2'
+}
+
+def _wait_clone(proc: sp.Popen, url: str, path: str, ret: dict, failed: list, lock: threading.Lock, cwd: str):
+    if proc.wait() != 0:
+        with lock:
+            failed.append(url)
+        return
+    # record the finished clone and rewrite map.json atomically;
+    with lock:
+        ret[url] = path
+        with open(os.path.join(cwd, 'map.json.tmp'), 'w') as fp:
+            json.dump(ret, fp)
+        os.replace(os.path.join(cwd, 'map.json.tmp'), os.path.join(cwd, 'map.json'))
 
 if __name__ == '__main__':
-    procs = list[sp.Popen]()
     ret = {}
+    failed = list[str]()
+    lock = threading.Lock()
+    waiters = list[threading.Thread]()
     cwd = os.path.dirname(__file__)
-    for url in urls:
-        name = md5(url.encode('utf-8')).hexdigest()
-        procs.append(sp.Popen([
-            'git', 'clone', '--bare',
+    for url, name in REPO_NAMES.items():
+        proc = sp.Popen([
+            'git', 'clone', '--bare', '-q',
             url, f'./{name}.git'
-        ], stdout=sp.DEVNULL, stdin=sp.DEVNULL, cwd=cwd))
-        ret[url] = os.path.abspath(os.path.join(cwd, f'./{name}.git'))
+        ], stdout=sp.DEVNULL, stderr=sp.DEVNULL, stdin=sp.DEVNULL, cwd=cwd)
+        waiter = threading.Thread(target=_wait_clone, args=(
+            proc, url, os.path.abspath(os.path.join(cwd, f'./{name}.git')), ret, failed, lock, cwd
+        ))
+        waiter.start()
+        waiters.append(waiter)
 
-    with open(os.path.join(cwd, 'map.json'), 'w') as fp:
-        json.dump(ret, fp)
+    for waiter in waiters:
+        waiter.join()
 
-    while len(procs) > 0:
-        procs[0].wait()
-        procs = procs[1:]
+    if len(failed) > 0:
+        raise RuntimeError('Failed to clone: ' + ', '.join(failed))
@@ -31,17 +31,40 @@ class JobId(int):
         raise NotImplementedError()
 
     def __str__(self):
-        s = hex(self)[2:]
-        return '0' * (8 - len(s)) + s
+        return format(self, '08x')
 
     def __repr__(self):
         return self.__str__()
 
+    @classmethod
+    def _from_int(cls, value: int):
+        return int.__new__(cls, value)
+
+    @staticmethod
+    def _reject_str(value):
+        if isinstance(value, str):
+            raise ValueError('JobId strings are hex digits')
+        return value
+
+    @classmethod
+    def _from_hex(cls, value: str):
+        # callers check the digits first, see the str branch below;
+        return int.__new__(cls, int(value, 16))
+
     @classmethod
     def __get_pydantic_core_schema__(cls, source_type: type[Any], handler: GetCoreSchemaHandler):
-        return core_schema.no_info_after_validator_function(
-            cls,
-            handler(Union[int, str]),
+        # one converter per branch, no type dispatch in __new__;
+        return core_schema.union_schema(
+            [
+                # hex digits only: no sign, '0x', padding or underscores;
+                core_schema.no_info_after_validator_function(cls._from_hex, core_schema.str_schema(pattern='^[0-9a-fA-F]+$')),
+                # lax for numbers, but a str like '-1' must not fall through to an int parse;
+                core_schema.no_info_after_validator_function(
+                    cls._from_int,
+                    core_schema.no_info_before_validator_function(cls._reject_str, core_schema.int_schema())
+                )
+            ],
+            mode='left_to_right',
             serialization=core_schema.plain_serializer_function_ser_schema(
                 cls.__str__
             )
@@ -99,10 +122,10 @@ class JobResult(BaseModel):
     jobException: SerializeAsAny[JobException] | None=None
     workerException: WorkerException | None=None
 
-from .storage_backends import StorageProviderConfig
+from .storage_backends import StorageProviderConfig, AnyStorageProviderConfig
 
 class SystemConfig(BaseModel):
-    storage: SerializeAsAny[StorageProviderConfig]
+    storage: AnyStorageProviderConfig
     workerConfig: Dict[str, Any] | None=None
     deploymentName: str
 
@@ -119,6 +142,8 @@ class JobWorker(BaseModel):
     workerResult: SerializeAsAny[JobResult] | None=None
 
 class JobDigest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     jobId: JobId
     createdTime: datetime
     modifiedTime: datetime
@@ -145,9 +170,13 @@ class JobRequest(BaseModel):
 # RPC;
 
 class SystemConfigRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     workerType: str
 
 class JobUpdateRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     workerHostname: str
     workerType: str
     workerIndex: int
@@ -155,6 +184,8 @@ class JobUpdateRequest(BaseModel):
     deliverable: SerializeAsAny[JobResult]
 
 class JobFocusRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     jobId: JobId
     workerHostname: str
 
@@ -164,10 +195,15 @@ class JobFocusStatus(str, Enum):
 
 class JobFocusReceipt(BaseModel):
     status: JobFocusStatus
-    jobContext: JobContext
+    # only sent along when focused;
+    jobContext: JobContext | None=None
 
 class JobAbortRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     jobId: JobId
 
 class JobYieldRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     jobId: JobId
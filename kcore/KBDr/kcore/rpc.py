@@ -2,8 +2,10 @@ from aio_pika import Message
 from aio_pika.abc import AbstractRobustConnection, AbstractIncomingMessage, AbstractChannel
 from pydantic import BaseModel
 
+from .utils import model_dump_json_bytes
+
 import asyncio, uuid
-from typing import MutableMapping, Callable, Generic, TypeVar
+from typing import MutableMapping, Callable, Generic, Hashable, TypeVar
 
 class GeneralRpcClient:
 
@@ -65,7 +67,7 @@ class RpcClient(Generic[_RpcClientArgumentT, _RpcClientReceiptT], GeneralRpcClie
         await super(RpcClient, self).start()
 
     async def __call__(self, argument: _RpcClientArgumentT) -> _RpcClientReceiptT:
-        ret = await super(RpcClient, self).__call__(self._rpc_name, argument.model_dump_json().encode('utf-8'))
+        ret = await super(RpcClient, self).__call__(self._rpc_name, model_dump_json_bytes(argument))
         if self._receipt_type is None:
             return None
         else:
@@ -84,10 +86,16 @@ class RpcServer(Generic[_RpcServerArgumentT, _RpcServerReceiptT]):
         rpc_name: str,
         consume_func: Callable[[_RpcServerArgumentT], _RpcServerReceiptT],
         request_type: type[BaseModel],
-        receipt_type: type[BaseModel] | None
+        receipt_type: type[BaseModel] | None,
+        prefetch_count: int=1,
+        cache_key_fn: Callable[[_RpcServerArgumentT], Hashable] | None=None
     ):
         self._mq_conn = mq_conn
         self._mq_chan = None
+        self._prefetch_count = prefetch_count
+        # replies of idempotent RPCs over process-lifetime data can be cached by key;
+        self._cache_key_fn = cache_key_fn
+        self._cached_bodies: dict[Hashable, bytes] = {}
         self._consume_func = consume_func
         self._rpc_name = rpc_name
         self._request_type = request_type
@@ -97,21 +105,26 @@ class RpcServer(Generic[_RpcServerArgumentT, _RpcServerReceiptT]):
         if self._mq_chan is not None:
             raise IOError('RPC server started already')
         self._mq_chan = await self._mq_conn.channel()
-        await self._mq_chan.set_qos(prefetch_count=1)
+        await self._mq_chan.set_qos(prefetch_count=self._prefetch_count)
         self._callback_queue = await self._mq_chan.declare_queue(self._rpc_name)
         await self._callback_queue.consume(self._on_invocation)
 
     async def _on_invocation(self, message: AbstractIncomingMessage):
         async with message.process(requeue=True):
             arg = self._request_type.model_validate_json(message.body)
-            ret = await self._consume_func(arg)
-            if self._receipt_type is None:
-                ret = 'null'
-            else:
-                ret = self._receipt_type.model_dump_json(ret)
+            cache_key = None if self._cache_key_fn is None else self._cache_key_fn(arg)
+            ret = self._cached_bodies.get(cache_key) if cache_key is not None else None
+            if ret is None:
+                ret = await self._consume_func(arg)
+                if self._receipt_type is None:
+                    ret = b'null'
+                else:
+                    ret = model_dump_json_bytes(ret)
+                if cache_key is not None:
+                    self._cached_bodies[cache_key] = ret
             await self._mq_chan.default_exchange.publish(
                 Message(
-                    body=ret.encode('utf-8'),
+                    body=ret,
                     correlation_id=message.correlation_id,
                 ),
                 routing_key=message.reply_to
@@ -1,4 +1,5 @@
 from abc import abstractmethod
+import asyncio
 
 from .rpc import *
 from .models import *
@@ -17,9 +18,11 @@ class SchedulerClient:
         self.update_job = RpcClient[JobUpdateRequest, None](self._mq_conn, 'scheduler.update_job', JobUpdateRequest, None)
 
     async def start(self):
-        await self.get_system_config.start()
-        await self.focus_job.start()
-        await self.update_job.start()
+        await asyncio.gather(
+            self.get_system_config.start(),
+            self.focus_job.start(),
+            self.update_job.start()
+        )
 
 class SchedulerServerBase:
     _get_system_config: RpcServer[SystemConfigRequest, SystemConfig] = None
@@ -28,9 +31,9 @@ class SchedulerServerBase:
 
     def __init__(self, mq_conn: AbstractRobustConnection):
         self._mq_conn = mq_conn
-        self._get_system_config = RpcServer[SystemConfigRequest, SystemConfig](self._mq_conn, 'scheduler.get_system_config', self.get_system_config, SystemConfigRequest, SystemConfig)
+        self._get_system_config = RpcServer[SystemConfigRequest, SystemConfig](self._mq_conn, 'scheduler.get_system_config', self.get_system_config, SystemConfigRequest, SystemConfig, cache_key_fn=lambda request: request.workerType)
         self._focus_job = RpcServer[JobFocusRequest, JobFocusReceipt](self._mq_conn, 'scheduler.focus_job', self.focus_job, JobFocusRequest, JobFocusReceipt)
-        self._update_job = RpcServer[JobUpdateRequest, None](self._mq_conn, 'scheduler.update_job', self.update_job, JobUpdateRequest, None)
+        self._update_job = RpcServer[JobUpdateRequest, None](self._mq_conn, 'scheduler.update_job', self.update_job, JobUpdateRequest, None, prefetch_count=16)
 
     @abstractmethod
     async def get_system_config(self, request: SystemConfigRequest) -> SystemConfig:
@@ -45,6 +48,8 @@ class SchedulerServerBase:
         raise NotImplementedError()
 
     async def start(self):
-        await self._get_system_config.start()
-        await self._focus_job.start()
-        await self._update_job.start()
+        await asyncio.gather(
+            self._get_system_config.start(),
+            self._focus_job.start(),
+            self._update_job.start()
+        )
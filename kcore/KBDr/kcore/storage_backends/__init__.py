@@ -1,6 +1,15 @@
-from .storage_abc import AbstractStorageBackend, StorageProviderConfig
-from .storage_gcs import GCSStorageBackend
-from .storage_local import LocalStorageBackend
+from typing import Annotated, Union
+from pydantic import Field
+
+from .storage_abc import AbstractStorageBackend, StorageProviderConfig, StorageResourceEntry, StorageResourcePage
+from .storage_gcs import GCSStorageBackend, GCSStorageProviderConfig
+from .storage_local import LocalStorageBackend, LocalStorageProviderConfig
+
+# parsed once into the concrete config, backends take it as-is;
+AnyStorageProviderConfig = Annotated[
+    Union[GCSStorageProviderConfig, LocalStorageProviderConfig],
+    Field(discriminator='providerType')
+]
 
 async def create_storage_backend(config: StorageProviderConfig) -> AbstractStorageBackend:
     if config.providerType == 'gcs':
@@ -1,10 +1,21 @@
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, List
 from pydantic import BaseModel, RootModel
+from ..models import JobResource
 
 class StorageProviderConfig(BaseModel):
     providerType: str
     providerConfig: RootModel | None
 
+class StorageResourceEntry(BaseModel):
+    key: str
+    size: int
+
+class StorageResourcePage(BaseModel):
+    # None on the last page; pass it back for the next one;
+    page: List[StorageResourceEntry]
+    nextPageToken: str | None=None
+
 class AbstractStorageBackend(ABC):
 
     @abstractmethod
@@ -15,16 +26,31 @@ class AbstractStorageBackend(ABC):
     async def download_resource(self, key: str, local_path: str):
         pass
 
+    @abstractmethod
+    def download_resource_stream(self, key: str) -> AsyncIterator[bytes]:
+        # the resource's bytes in order, without a local copy;
+        pass
+
     @abstractmethod
     async def upload_resource(self, local_path: str, key: str):
         pass
 
+    @abstractmethod
+    async def put(self, local_path: str, key: str) -> JobResource | None:
+        # upload and describe a resource, None for empty files;
+        pass
+
     @abstractmethod
     async def delete_resource(self, key: str):
         pass
 
     @abstractmethod
-    async def list_resources(self, key_prefix: str) -> list[str]:
+    async def list_resources(self, key_prefix: str, page_size: int=1000, page_token: str | None=None) -> StorageResourcePage:
+        pass
+
+    @abstractmethod
+    async def get_resource_generation(self, key: str) -> int:
+        # changes whenever the key is overwritten;
         pass
 
     @abstractmethod
@@ -1,9 +1,47 @@
 
 from pydantic import BaseModel, RootModel
-from .storage_abc import AbstractStorageBackend, StorageProviderConfig
-from typing import Literal
+from .storage_abc import AbstractStorageBackend, StorageProviderConfig, StorageResourceEntry, StorageResourcePage, JobResource
+from typing import AsyncIterator, Literal
 from ..utils import run_async
-import os
+import asyncio, collections, os, threading
+
+_HTTP_POOL_SIZE = 64
+
+# one client per process, shared by every backend, keeps the connections warm;
+_CLIENT = None
+_BUCKETS = {}
+_CLIENT_LOCK = threading.Lock()
+
+def _get_bucket(bucket_name: str):
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            from google.cloud.storage import Client
+            from requests.adapters import HTTPAdapter
+            _CLIENT = Client()
+            # chunked transfers run many threads on the one session;
+            adapter = HTTPAdapter(pool_connections=_HTTP_POOL_SIZE, pool_maxsize=_HTTP_POOL_SIZE)
+            _CLIENT._http.mount('https://', adapter)
+            _CLIENT._http.mount('http://', adapter)
+        bucket = _BUCKETS.get(bucket_name)
+        if bucket is None:
+            bucket = _BUCKETS[bucket_name] = _CLIENT.bucket(bucket_name)
+        return _CLIENT, bucket
+
+# (size limit, workers, chunk size) buckets, the last one is open-ended;
+_TRANSFER_PARAMS = (
+    (50 * 1000 * 1000, 4, 8 << 20),
+    (250 * 1000 * 1000, 8, 16 << 20),
+    (None, 16, 32 << 20)
+)
+
+def _pick_transfer_params(fsize: int) -> tuple[int, int]:
+    for size_limit, workers, chunk_size in _TRANSFER_PARAMS:
+        if size_limit is None or fsize < size_limit:
+            return workers, chunk_size
+
+# streamed reads are smaller, a window of them is held in memory;
+_STREAM_CHUNK_SIZE = 8 << 20
 
 class GCSStorageProviderConfigSetting(BaseModel):
     bucketName: str
@@ -15,25 +53,85 @@ class GCSStorageProviderConfig(StorageProviderConfig):
 class GCSStorageBackend(AbstractStorageBackend):
 
     def __init__(self, storage_config: StorageProviderConfig):
-        self.storage_config = GCSStorageProviderConfig(**storage_config.model_dump())
+        if isinstance(storage_config, GCSStorageProviderConfig):
+            self.storage_config = storage_config
+        else:
+            self.storage_config = GCSStorageProviderConfig(**storage_config.model_dump())
 
-        from google.cloud.storage import Client
-        self._client = Client()
-        self._bucket = self._client.bucket(self.storage_config.providerConfig.root.bucketName)
+        self._client, self._bucket = _get_bucket(self.storage_config.providerConfig.root.bucketName)
 
     async def download_resource(self, key: str, local_path: str):
-        from google.cloud.storage.transfer_manager import download_chunks_concurrently
-        await run_async(download_chunks_concurrently, self._bucket.get_blob(key), local_path)
+        from google.cloud.storage.transfer_manager import download_chunks_concurrently, THREAD
+        # get_blob fetches the metadata, size included;
+        blob = await run_async(self._bucket.get_blob, key)
+        workers, chunk_size = _pick_transfer_params(blob.size)
+        await run_async(
+            download_chunks_concurrently, blob, local_path,
+            chunk_size=chunk_size,
+            max_workers=workers,
+            worker_type=THREAD
+        )
+
+    async def download_resource_stream(self, key: str) -> AsyncIterator[bytes]:
+        blob = await run_async(self._bucket.get_blob, key)
+        workers, _ = _pick_transfer_params(blob.size)
+        # keep a window of ranged reads in flight, hand them out in order;
+        pending = collections.deque[asyncio.Future]()
+        offset = 0
+        try:
+            while offset < blob.size or pending:
+                while offset < blob.size and len(pending) < workers:
+                    end = min(offset + _STREAM_CHUNK_SIZE, blob.size)
+                    pending.append(asyncio.ensure_future(run_async(
+                        blob.download_as_bytes, start=offset, end=end - 1, checksum=None
+                    )))
+                    offset = end
+                yield await pending.popleft()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _upload(self, local_path: str, key: str, skip_empty: bool) -> int:
+        from google.cloud.storage.transfer_manager import upload_chunks_concurrently, THREAD
+        fsize = os.stat(local_path).st_size
+        if fsize == 0 and skip_empty:
+            return fsize
+        workers, chunk_size = _pick_transfer_params(fsize)
+        upload_chunks_concurrently(
+            local_path, self._bucket.blob(key),
+            chunk_size=chunk_size,
+            max_workers=workers,
+            worker_type=THREAD
+        )
+        return fsize
 
     async def upload_resource(self, local_path: str, key: str):
-        from google.cloud.storage.transfer_manager import upload_chunks_concurrently
-        await run_async(upload_chunks_concurrently, local_path, self._bucket.blob(key))
+        await run_async(self._upload, local_path, key, False)
+
+    async def put(self, local_path: str, key: str) -> JobResource | None:
+        if await run_async(self._upload, local_path, key, True) == 0:
+            return None
+        return JobResource(key=key, storageUri=await self.get_resource_url(key))
 
     async def delete_resource(self, key: str):
         await run_async(self._bucket.get_blob(key).delete)
 
-    async def list_resources(self, key_prefix: str) -> list[str]:
-        return [e.path for e in await run_async(self._bucket.list_blobs, prefix=key_prefix)]
+    def _list_blob_page(self, key_prefix: str, page_size: int, page_token: str | None) -> StorageResourcePage:
+        # one listing request, names and sizes only; GCS hands out the cursor;
+        blobs = self._bucket.list_blobs(
+            prefix=key_prefix, max_results=page_size, page_token=page_token,
+            fields='items(name,size),nextPageToken'
+        )
+        page = [StorageResourceEntry(key=blob.name, size=blob.size) for blob in blobs]
+        return StorageResourcePage(page=page, nextPageToken=blobs.next_page_token)
+
+    async def list_resources(self, key_prefix: str, page_size: int=1000, page_token: str | None=None) -> StorageResourcePage:
+        return await run_async(self._list_blob_page, key_prefix, page_size, page_token)
+
+    async def get_resource_generation(self, key: str) -> int:
+        # bumped by GCS on every overwrite, so it pins the content of a key;
+        blob = await run_async(self._bucket.get_blob, key)
+        return blob.generation
 
     async def get_resource_url(self, key: str) -> str:
         return f'https://storage.cloud.google.com/{self.storage_config.providerConfig.root.bucketName}/{key}'
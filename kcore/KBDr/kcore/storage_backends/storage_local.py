@@ -1,9 +1,164 @@
 
 from pydantic import BaseModel, RootModel
-from .storage_abc import AbstractStorageBackend, StorageProviderConfig
-from typing import Literal
+from .storage_abc import AbstractStorageBackend, StorageProviderConfig, StorageResourceEntry, StorageResourcePage, JobResource
+from typing import AsyncIterator, Literal
 from ..utils import run_async
-import shutil, os
+import asyncio, heapq, os
+
+_SMALL_COPY_SIZE = 128 << 10
+_COPY_BUFSIZE = 1 << 20
+_STREAM_CHUNK_SIZE = 4 << 20
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(src_fd, dst_fd, count, offset)
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+# in-kernel copies, best first; both advance only the destination offset;
+_ZERO_COPY_FUNCS = tuple(func for name, func in (
+    ('copy_file_range', _copy_file_range),
+    ('sendfile', _sendfile)
+) if hasattr(os, name))
+
+def _zero_copy(src_fd: int, dst_fd: int, size: int) -> int:
+    copied = 0
+    for copy_func in _ZERO_COPY_FUNCS:
+        try:
+            while copied < size:
+                n = copy_func(src_fd, dst_fd, copied, size - copied)
+                if n == 0:
+                    return copied
+                copied += n
+            return copied
+        except OSError:
+            continue
+    return copied
+
+def _fastcopy(src: str, dst: str):
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        copied = 0
+        if size >= _SMALL_COPY_SIZE:
+            copied = _zero_copy(fsrc.fileno(), fdst.fileno(), size)
+        if copied >= size:
+            return
+        # userspace fallback for small files and unsupported filesystems;
+        fsrc.seek(copied)
+        fdst.seek(copied)
+        buf = memoryview(bytearray(_COPY_BUFSIZE))
+        while (n := fsrc.readinto(buf)) > 0:
+            fdst.write(buf[:n])
+
+_PARALLEL_COPY_SIZE = 64 << 20
+_PARALLEL_COPY_PART_SIZE = 32 << 20
+_PARALLEL_COPY_CONCURRENCY = 8
+
+def _open_parallel_copy(src: str, dst: str) -> tuple[int, int, int]:
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        size = os.fstat(src_fd).st_size
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    except BaseException:
+        os.close(src_fd)
+        raise
+    try:
+        try:
+            os.posix_fallocate(dst_fd, 0, size)
+        except (AttributeError, OSError):
+            os.ftruncate(dst_fd, size)
+    except BaseException:
+        os.close(src_fd)
+        os.close(dst_fd)
+        raise
+    return src_fd, dst_fd, size
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, count: int):
+    # positional copies only, parts share the descriptors;
+    end = offset + count
+    try:
+        while offset < end:
+            n = os.copy_file_range(src_fd, dst_fd, end - offset, offset, offset)
+            if n == 0:
+                break
+            offset += n
+    except (AttributeError, OSError):
+        pass
+    while offset < end:
+        data = os.pread(src_fd, min(_COPY_BUFSIZE, end - offset), offset)
+        if len(data) == 0:
+            break
+        offset += os.pwrite(dst_fd, data, offset)
+
+def _local_copy_into(src: str, dst: str, skip_empty: bool) -> tuple[int, tuple[int, int, int] | None]:
+    # one executor hop: create the parent, copy small files right away;
+    # large ones come back opened for the parallel copy;
+    size = os.stat(src).st_size
+    if size == 0 and skip_empty:
+        return size, None
+    parent = os.path.dirname(dst)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    if size < _PARALLEL_COPY_SIZE:
+        _fastcopy(src, dst)
+        return size, None
+    return size, _open_parallel_copy(src, dst)
+
+def _remove_if_exists(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _list_dir_page(path: str, page_size: int, after: str | None) -> tuple[list[tuple[str, int]], str | None]:
+    # pages follow name order with the last name as the cursor, so entries
+    # coming and going between calls don't shift the later pages;
+    # d_type from getdents tells files apart without a stat, only the page's
+    # entries get stat'ed, and only page_size + 1 of them are held;
+    try:
+        with os.scandir(path) as it:
+            entries = heapq.nsmallest(
+                page_size + 1,
+                (
+                    entry for entry in it
+                    if entry.is_file(follow_symlinks=False) and (after is None or entry.name > after)
+                ),
+                key=lambda entry: entry.name
+            )
+    except (FileNotFoundError, NotADirectoryError):
+        return [], None
+    page = []
+    for entry in entries[:page_size]:
+        try:
+            page.append((entry.name, entry.stat(follow_symlinks=False).st_size))
+        except FileNotFoundError:
+            pass
+    next_after = entries[page_size - 1].name if len(entries) > page_size else None
+    return page, next_after
+
+async def _copy(src: str, dst: str, skip_empty: bool=False) -> int:
+    size, opened = await run_async(_local_copy_into, src, dst, skip_empty)
+    if opened is None:
+        return size
+    src_fd, dst_fd, size = opened
+    sem = asyncio.Semaphore(_PARALLEL_COPY_CONCURRENCY)
+    stopped = False
+    async def _copy_part(offset: int):
+        async with sem:
+            if not stopped:
+                await run_async(_copy_range, src_fd, dst_fd, offset, min(_PARALLEL_COPY_PART_SIZE, size - offset))
+    parts = [asyncio.ensure_future(_copy_part(offset)) for offset in range(0, size, _PARALLEL_COPY_PART_SIZE)]
+    try:
+        # shielded, a cancel mustn't detach parts still running in the executor;
+        await asyncio.shield(asyncio.gather(*parts))
+    finally:
+        # executor threads can't be interrupted, the fds stay open until every
+        # started part is out; the queued ones are skipped;
+        stopped = True
+        await asyncio.wait(parts)
+        os.close(src_fd)
+        os.close(dst_fd)
+    return size
 
 class LocalStorageProviderConfigSetting(BaseModel):
     root: str
@@ -15,30 +170,49 @@ class LocalStorageProviderConfig(StorageProviderConfig):
 class LocalStorageBackend(AbstractStorageBackend):
 
     def __init__(self, storage_config: StorageProviderConfig):
-        self.storage_config = LocalStorageProviderConfig(**storage_config.model_dump())
+        if isinstance(storage_config, LocalStorageProviderConfig):
+            self.storage_config = storage_config
+        else:
+            self.storage_config = LocalStorageProviderConfig(**storage_config.model_dump())
         self._root = self.storage_config.providerConfig.root.root
 
     async def download_resource(self, key: str, local_path: str):
-        await run_async(os.makedirs, os.path.dirname(os.path.join(self._root, key)), exist_ok=True)
-        await run_async(shutil.copy, os.path.join(self._root, key), local_path)
+        await _copy(os.path.join(self._root, key), local_path)
+
+    async def download_resource_stream(self, key: str) -> AsyncIterator[bytes]:
+        fd = await run_async(os.open, os.path.join(self._root, key), os.O_RDONLY)
+        try:
+            while chunk := await run_async(os.read, fd, _STREAM_CHUNK_SIZE):
+                yield chunk
+        finally:
+            os.close(fd)
 
     async def upload_resource(self, local_path: str, key: str):
-        await run_async(os.makedirs, os.path.dirname(os.path.join(self._root, key)), exist_ok=True)
-        await run_async(shutil.copy, local_path, os.path.join(self._root, key))
+        await _copy(local_path, os.path.join(self._root, key))
+
+    async def put(self, local_path: str, key: str) -> JobResource | None:
+        dst = os.path.join(self._root, key)
+        if await _copy(local_path, dst, skip_empty=True) == 0:
+            return None
+        return JobResource(key=key, storageUri=os.path.abspath(dst))
 
     async def delete_resource(self, key: str):
-        if not await run_async(os.path.exists, os.path.join(self._root, key)):
-            return
-        await run_async(os.remove, os.path.join(self._root, key))
-
-    async def list_resources(self, key_prefix: str) -> list[str]:
-        if not await run_async(os.path.isdir, os.path.join(self._root, key_prefix)):
-            return []
-        filenames = await run_async(os.listdir, os.path.join(self._root, key_prefix))
-        ret = []
-        for fname in filenames:
-            ret.append(os.path.join(self._root, fname))
-        return ret
+        await run_async(_remove_if_exists, os.path.join(self._root, key))
+
+    async def list_resources(self, key_prefix: str, page_size: int=1000, page_token: str | None=None) -> StorageResourcePage:
+        # the token is the last file name of the previous page;
+        entries, next_token = await run_async(_list_dir_page, os.path.join(self._root, key_prefix), page_size, page_token)
+        return StorageResourcePage(
+            page=[
+                StorageResourceEntry(key=os.path.join(key_prefix, name), size=size)
+                for name, size in entries
+            ],
+            nextPageToken=next_token
+        )
+
+    async def get_resource_generation(self, key: str) -> int:
+        # every copy onto the key rewrites it, the mtime stands in for a generation;
+        return (await run_async(os.stat, os.path.join(self._root, key))).st_mtime_ns
 
     async def get_resource_url(self, key: str) -> str:
         return os.path.abspath(os.path.join(self._root, key))
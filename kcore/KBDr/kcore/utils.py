@@ -1,16 +1,63 @@
 # utils.py
 from typing import Any, Callable, Generic, List, TypeVar
-import asyncio, functools
+from concurrent.futures import ThreadPoolExecutor
+import asyncio, atexit, functools, os
 from pydantic import BaseModel
 
+# blocking file-system calls go to their own pool, not the loop's default one;
+_IO_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('KGYM_IO_THREADS', 64)),
+    thread_name_prefix='kcore-io'
+)
+atexit.register(_IO_EXECUTOR.shutdown, wait=False, cancel_futures=True)
+
 async def run_async(func: Callable, *args: Any, **kwargs: Any):
     return await asyncio.get_running_loop().run_in_executor(
-        None,
+        _IO_EXECUTOR,
         functools.partial(func, *args, **kwargs)
     )
 
+def _fast_rmtree(path: str):
+    # iterative post-order removal on one stack of scandir iterators;
+    # d_type from getdents spares a stat per entry, errors are ignored;
+    try:
+        stack = [(path, os.scandir(path))]
+    except OSError:
+        return
+    while stack:
+        dir_path, it = stack[-1]
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, os.scandir(entry.path)))
+                    break
+                os.unlink(entry.path)
+            except OSError:
+                pass
+        else:
+            it.close()
+            stack.pop()
+            try:
+                os.rmdir(dir_path)
+            except OSError:
+                pass
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    # prefer uvloop for the message-heavy RPC paths when it's available;
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.new_event_loop()
+    return uvloop.new_event_loop()
+
+def model_dump_json_bytes(model: BaseModel) -> bytes:
+    # serialize straight to bytes, skipping the intermediate str;
+    return model.__pydantic_serializer__.to_json(model)
+
+@functools.cache
 def get_type_fullname(typ):
-    return '.'.join([typ.__module__, typ.__name__])
+    # memoized per type, builtin exception types included;
+    return f'{typ.__module__}.{typ.__name__}'
 
 _T = TypeVar('_T')
 
@@ -1,4 +1,4 @@
-import platform, traceback, shutil, tempfile, os
+import platform, traceback, tempfile, os
 from datetime import datetime, timezone
 from signal import SIGTERM
 from abc import abstractmethod
@@ -6,11 +6,12 @@ from abc import abstractmethod
 from .rpc import *
 from .models import *
 from .scheduler import SchedulerClient
-from .utils import get_type_fullname, run_async
+from .utils import _fast_rmtree, get_type_fullname, model_dump_json_bytes, new_event_loop, run_async
 from .storage_backends import create_storage_backend, AbstractStorageBackend
 
 from aio_pika.abc import AbstractChannel
 from aio_pika import Message, connect_robust
+from pydantic_core import to_json
 
 class WorkerControl:
 
@@ -23,7 +24,7 @@ class WorkerControl:
     async def _control_worker(self, command: str, worker_hostname: str, request: BaseModel):
         return await (self._rpc_client(
             f'workers.{worker_hostname}.{command}',
-            request.model_dump_json().encode('utf-8')
+            model_dump_json_bytes(request)
         ))
 
     async def abort_job(self, worker_hostname: str, request: JobAbortRequest) -> None:
@@ -51,15 +52,13 @@ class TaskBase:
         return f'jobs/{self.job_ctx.jobId}/{self.job_ctx.currentWorker}_{self._worker.worker_type}/'
 
     async def submit_resource(self, in_folder_key: str, local_path: str) -> JobResource | None:
-        fsize = (await run_async(os.stat, local_path)).st_size
-        if fsize == 0:
+        # a stat is cheaper than the executor hop, skip the backend for missing/empty files;
+        try:
+            if os.stat(local_path).st_size == 0:
+                return None
+        except FileNotFoundError:
             return None
-        key = self._get_storage_prefix() + in_folder_key
-        await self.storage_backend.upload_resource(local_path, self._get_storage_prefix() + in_folder_key)
-        return JobResource(
-            key=key,
-            storageUri=await self.storage_backend.get_resource_url(key)
-        )
+        return await self.storage_backend.put(local_path, self._get_storage_prefix() + in_folder_key)
 
     async def report_job_log(self, message):
         await self._worker.report_job_log(self.job_ctx.jobId, message)
@@ -77,7 +76,7 @@ class TaskBase:
             await self.on_clean()
         except:
             pass
-        await run_async(shutil.rmtree, self.cwd, ignore_errors=True)
+        await run_async(_fast_rmtree, self.cwd)
 
     async def run(self) -> JobResult:
         # prepare one just in case;
@@ -138,8 +137,13 @@ class Worker:
 
         self.worker_type = worker_type
         self.worker_hostname = platform.node()
+        # constant part of every log body;
+        self._log_prefix = b'{"workerType":%s,"workerHostname":%s' % (
+            to_json(self.worker_type),
+            to_json(self.worker_hostname)
+        )
 
-        self._blocker_lock = asyncio.Semaphore(0)
+        self._blocker_lock = asyncio.Event()
         self._closed = False
         self._task_type = task_type
         self._yield_blocker = None
@@ -147,34 +151,33 @@ class Worker:
         self.current_task = None
         self.system_config: SystemConfig = None
         self.storage_backend: AbstractStorageBackend = None
+        self._storage_config = None
 
-    async def _send_message(self, queue_name: str, message: RootModel):
+    async def _send_message(self, queue_name: str, body: bytes):
         await self.job_chan.default_exchange.publish(
-            Message(body=message.model_dump_json().encode('utf-8')),
+            Message(body=body),
             routing_key=queue_name,
         )
 
+    def _log_body(self, prefix: bytes, message) -> bytes:
+        # same document as SystemLog/JobLog.model_dump_json(), without the models;
+        return b''.join((
+            prefix,
+            b',"timeStamp":', to_json(datetime.now(timezone.utc)),
+            b',"content":', to_json(message),
+            b'}'
+        ))
+
     async def report_system_log(self, message):
         await self._send_message(
             'scheduler.insert_system_log',
-            SystemLog(
-                timeStamp=datetime.now(timezone.utc),
-                workerType=self.worker_type,
-                workerHostname=self.worker_hostname,
-                content=message
-            )
+            self._log_body(self._log_prefix, message)
         )
 
     async def report_job_log(self, job_id: JobId, message):
         await self._send_message(
             'scheduler.insert_job_log',
-            JobLog(
-                jobId=job_id,
-                timeStamp=datetime.now(timezone.utc),
-                workerType=self.worker_type,
-                workerHostname=self.worker_hostname,
-                content=message
-            )
+            self._log_body(b'{"jobId":"%s",%s' % (str(job_id).encode(), self._log_prefix[1:]), message)
         )
 
     def _cancel_job(self, job_id: JobId, code: str) -> None:
@@ -204,7 +207,10 @@ class Worker:
             ret: JobFocusReceipt = await self.scheduler.focus_job(JobFocusRequest(jobId=job_id, workerHostname=self.worker_hostname))
             if ret is None or ret.status == JobFocusStatus.rejected:
                 return
-            self.storage_backend: AbstractStorageBackend = await create_storage_backend(self.system_config.storage)
+            # keep the backend, and its client, while the storage config holds;
+            if self.storage_backend is None or self._storage_config != self.system_config.storage:
+                self.storage_backend = await create_storage_backend(self.system_config.storage)
+                self._storage_config = self.system_config.storage
 
             self.current_task = self._task_type(self, ret.jobContext)
             result: JobResult = await self.current_task.run()
@@ -222,7 +228,7 @@ class Worker:
             if result.workerException.code != WorkerYieldedExceptionCode:
                 return
             if self._yield_blocker:
-                await self._yield_blocker.release()
+                self._yield_blocker.set()
 
     async def _signal_handler(self):
         self._closed = True
@@ -233,18 +239,18 @@ class Worker:
         if self.current_task:
             if self.current_task.task:
                 # job yielding logic;
-                self._yield_blocker = asyncio.Semaphore(0)
+                self._yield_blocker = asyncio.Event()
                 # cancel the job and tell it to yield;
                 self.current_task.task.cancel(WorkerYieldedExceptionCode)
                 await self.current_task.report_job_log(f'Worker going offline, yielded')
             # wait for completion;
             if self._yield_blocker:
-                await self._yield_blocker.acquire()
+                await self._yield_blocker.wait()
 
         await self.report_system_log(f'Worker {self.worker_type} at {self.worker_hostname} exiting')
         await self.mq_conn.close()
         # give signal here to exit the whole thing;
-        self._blocker_lock.release()
+        self._blocker_lock.set()
 
     async def _start(self):
         self.mq_conn = await connect_robust(self._conn_url)
@@ -281,7 +287,8 @@ class Worker:
 
         await self.report_system_log(f'Worker {self.worker_type} at {self.worker_hostname} joined')
 
-        await self._blocker_lock.acquire()
+        await self._blocker_lock.wait()
 
     def run(self):
-        asyncio.run(self._start())
+        with asyncio.Runner(loop_factory=new_event_loop) as runner:
+            runner.run(self._start())
@@ -3,14 +3,36 @@ import os, json, asyncio, functools
 import asyncio.subprocess as asp
 from concurrent.futures import ThreadPoolExecutor
 
+# multiplex ssh/scp calls to one host over a persistent master connection;
+SSH_OPTIONS = (
+    '-o', 'StrictHostKeyChecking=no',
+    '-o', 'ControlMaster=auto',
+    '-o', 'ControlPath=/tmp/kgym-ssh-%r@%h:%p',
+    '-o', 'ControlPersist=60'
+)
+
 async def run(prog, *args):
     if prog in ('ssh', 'scp'):
-        args = ('-o', 'StrictHostKeyChecking=no', *args)
+        args = (*SSH_OPTIONS, *args)
     proc = await asp.create_subprocess_exec(
         prog, *args, stdin=asp.DEVNULL
     )
     return await proc.wait()
 
+async def run_pipe(producer: tuple, consumer: tuple):
+    # producer | consumer, without a shell;
+    rfd, wfd = os.pipe()
+    try:
+        prod = await asp.create_subprocess_exec(*producer, stdin=asp.DEVNULL, stdout=wfd)
+    finally:
+        os.close(wfd)
+    try:
+        cons = await asp.create_subprocess_exec(*consumer, stdin=rfd)
+    finally:
+        os.close(rfd)
+    prod_ret, cons_ret = await asyncio.gather(prod.wait(), cons.wait())
+    return prod_ret or cons_ret
+
 class RemoteDeployment:
 
     def __init__(self, deployment_name: str):
@@ -21,6 +43,11 @@ class RemoteDeployment:
         self.compose_path = os.path.join('./deployment', self.deployment_name, 'compose.yml')
         with open(self.config_path, 'r') as fp:
             self.config = json.load(fp)
+        # name -> (user, hostname);
+        self.servers = {
+            name: (server['user'], server['hostname'])
+            for name, server in self.config['servers'].items()
+        }
 
         self.deploy_script_path = './deployment/deploy-new.sh'
 
@@ -40,10 +67,11 @@ class RemoteDeployment:
         print(hostname, 'brought up')
 
     async def update_config(self, username: str, hostname: str):
-        # scp ./deployment/{self.deployment_name}/{config.json,kgym-runner.env,compose.yml} {username}@{hostname}:
-        assert (await run('scp', f'./deployment/{self.deployment_name}/' + 'config.json', f'{username}@{hostname}:')) == 0
-        assert (await run('scp', f'./deployment/{self.deployment_name}/' + 'kgym-runner.env', f'{username}@{hostname}:')) == 0
-        assert (await run('scp', f'./deployment/{self.deployment_name}/' + 'compose.yml', f'{username}@{hostname}:')) == 0
+        # tar -cf - -C ./deployment/{self.deployment_name} config.json kgym-runner.env compose.yml | ssh {username}@{hostname} tar -xf -
+        assert (await run_pipe(
+            ('tar', '-cf', '-', '-C', f'./deployment/{self.deployment_name}', 'config.json', 'kgym-runner.env', 'compose.yml'),
+            ('ssh', *SSH_OPTIONS, f'{username}@{hostname}', 'tar -xf -')
+        )) == 0
         print(hostname, 'config updated')
 
     async def bring_down(self, username: str, hostname: str):
@@ -55,104 +83,75 @@ class RemoteDeployment:
         assert (await run('ssh', f'{username}@{hostname}', f'yes | sudo gcloud auth configure-docker {server}')) == 0
 
     async def config_artifact_reg(self, args):
-        tasks = []
-        for name in self.config['servers']:
-            tasks.append(asyncio.create_task(self.config_ar(self.config['servers'][name]['user'], self.config['servers'][name]['hostname'], args.server)))
-        await asyncio.wait(tasks)
+        async with asyncio.TaskGroup() as tg:
+            for user, hostname in self.servers.values():
+                tg.create_task(self.config_ar(user, hostname, args.server))
 
     async def new_deploy(self, args):
-        tasks = []
-        for name in self.config['servers']:
-            tasks.append(asyncio.create_task(self.deploy(self.config['servers'][name]['user'], self.config['servers'][name]['hostname'])))
-        await asyncio.wait(tasks)
+        async with asyncio.TaskGroup() as tg:
+            for user, hostname in self.servers.values():
+                tg.create_task(self.deploy(user, hostname))
 
     async def down(self, args):
-        service_map = {}
-        for name in self.config['servers']:
-            service_map[name] = list()
+        service_map = {name: [] for name in self.servers}
         for service in self.config['services']:
             for server in self.config['services'][service]:
                 service_map[server].append(service)
         mainServer = self.config['mainServer']
 
-        tasks = []
-        for server in service_map:
-            if server == mainServer:
-                continue
-            tasks.append(
-                asyncio.create_task(self.bring_down(
-                    self.config['servers'][server]['user'],
-                    self.config['servers'][server]['hostname']
+        async with asyncio.TaskGroup() as tg:
+            for server in service_map:
+                if server == mainServer:
+                    continue
+                tg.create_task(self.bring_down(
+                    *self.servers[server]
                 ))
-            )
-        await asyncio.wait(tasks)
         await self.bring_down(
-            self.config['servers'][mainServer]['user'],
-            self.config['servers'][mainServer]['hostname']
+            *self.servers[mainServer]
         )
 
-        tasks = []
-        for server in service_map:
-            tasks.append(
-                asyncio.create_task(self.update_config(
-                    self.config['servers'][server]['user'],
-                    self.config['servers'][server]['hostname']
+        async with asyncio.TaskGroup() as tg:
+            for server in service_map:
+                tg.create_task(self.update_config(
+                    *self.servers[server]
                 ))
-            )
-        await asyncio.wait(tasks)
 
     async def upgrade(self, args):
-        service_map = {}
-        for name in self.config['servers']:
-            service_map[name] = list()
+        service_map = {name: [] for name in self.servers}
         for service in self.config['services']:
             for server in self.config['services'][service]:
                 service_map[server].append(service)
         mainServer = self.config['mainServer']
 
-        tasks = []
-        for server in service_map:
-            if server == mainServer:
-                continue
-            tasks.append(
-                asyncio.create_task(self.bring_down(
-                    self.config['servers'][server]['user'],
-                    self.config['servers'][server]['hostname']
+        async with asyncio.TaskGroup() as tg:
+            for server in service_map:
+                if server == mainServer:
+                    continue
+                tg.create_task(self.bring_down(
+                    *self.servers[server]
                 ))
-            )
-        await asyncio.wait(tasks)
         await self.bring_down(
-            self.config['servers'][mainServer]['user'],
-            self.config['servers'][mainServer]['hostname']
+            *self.servers[mainServer]
         )
 
-        tasks = []
-        for server in service_map:
-            tasks.append(
-                asyncio.create_task(self.update_config(
-                    self.config['servers'][server]['user'],
-                    self.config['servers'][server]['hostname']
+        async with asyncio.TaskGroup() as tg:
+            for server in service_map:
+                tg.create_task(self.update_config(
+                    *self.servers[server]
                 ))
-            )
-        await asyncio.wait(tasks)
 
-        tasks = []
         await self.bring_up(
-            self.config['servers'][mainServer]['user'],
-            self.config['servers'][mainServer]['hostname'],
+            *self.servers[mainServer],
             service_map[mainServer]
         )
-        for server in service_map:
-            if server == mainServer:
-                continue
-            tasks.append(
-                asyncio.create_task(self.bring_up(
-                    self.config['servers'][server]['user'],
-                    self.config['servers'][server]['hostname'],
+        async with asyncio.TaskGroup() as tg:
+            for server in service_map:
+                if server == mainServer:
+                    continue
+                tg.create_task(self.bring_up(
+                    *self.servers[server],
                     service_map[server]
                 ))
-            )
-        await asyncio.wait(tasks)
 
 if __name__ == '__main__':
     import argparse
@@ -1,29 +1,29 @@
 import asyncio.subprocess as asp
-import re
+import asyncio, re
+
+FUNCTION_PATTERN = re.compile(r"^[0-9a-f]+ <([a-zA-Z0-9_\.]+)>:$")
+FILE_SPECIFIER_PATTERN = re.compile(r"(.+):\d+$")
 
 async def count_instructions(binary_file, source_file):
+    # objdump output can be huge, parse it line by line as it's produced;
     proc = await asp.create_subprocess_exec(
         'objdump', '-d', '-l', binary_file,
-        stdin=asp.DEVNULL, stdout=asp.PIPE, stderr=asp.PIPE
+        stdin=asp.DEVNULL, stdout=asp.PIPE, stderr=asp.DEVNULL,
+        limit=1 << 20
     )
 
-    stdout, _ = await proc.communicate()
-    stdout = stdout.decode()
-
-    code = await proc.wait()
-
     d = {}
     symb = set()
-    function_pattern = r"^[0-9a-f]+ <([a-zA-Z0-9_\.]+)>:$"
-    file_specifier_pattern = r"(.+):\d+$"
 
     in_function = False
     correct_file = False
     function_name = ''
     instructions_count = 0
-    for line in stdout.splitlines():
+    async for raw_line in proc.stdout:
+        line = raw_line.decode().rstrip('\n')
         if not in_function:
-            match = re.search(function_pattern, line)
+            # cheap checks first, most lines are instructions;
+            match = FUNCTION_PATTERN.search(line) if line.endswith('>:') else None
             if match:
                 function_name = match.group(1)
                 in_function = True
@@ -37,7 +37,9 @@ async def count_instructions(binary_file, source_file):
                     symb.add(function_name)
                 continue
             if not correct_file:
-                file_match = re.search(file_specifier_pattern, line)            
+                file_match = None
+                if line[-1:].isdigit() and ':' in line:
+                    file_match = FILE_SPECIFIER_PATTERN.search(line)
                 if file_match:
                     file_path = file_match.group(1)
                     if source_file in file_path:
@@ -45,22 +47,24 @@ async def count_instructions(binary_file, source_file):
                     continue
             elif line[-3:] != '():':
                 instructions_count += 1
+
+    code = await proc.wait()
     return d, len(symb), symb
 
 async def compare_binaries_subutil(file1, file2, source_file):
-    dict1, _, symb1 = await count_instructions(file1, source_file)
-    dict2, _, symb2 = await count_instructions(file2, source_file)
+    (dict1, _, symb1), (dict2, _, symb2) = await asyncio.gather(
+        count_instructions(file1, source_file),
+        count_instructions(file2, source_file)
+    )
 
     modified_functions = []
-    for symb in symb1:
-        if symb in symb2:
-            diff = abs(dict1[symb] - dict2[symb])
-            if diff > 0:
-                modified_functions.append({
-                    'function-name': symb,
-                    'instruction-count-before': dict1[symb],
-                    'instruction-count-after': dict2[symb]
-                })
+    for symb in symb1 & symb2:
+        if dict1[symb] != dict2[symb]:
+            modified_functions.append({
+                'function-name': symb,
+                'instruction-count-before': dict1[symb],
+                'instruction-count-after': dict2[symb]
+            })
 
     for symb in symb1 - symb2:
         modified_functions.append({
@@ -1,7 +1,6 @@
 import os, aiofiles
 import asyncio.subprocess as asp
 from .utils import KERNEL_SEED, KERNEL_MODULE_SIGNING_KEY
-from KBDr.kcore import run_async
 
 class CheckoutManager:
     
@@ -37,11 +36,11 @@ class CheckoutManager:
 
     async def ensure_reproducible(self):
         gcc_plugin_path = os.path.join(self.checkout_path, 'scripts', 'gcc-plugins')
-        if await run_async(os.path.exists, gcc_plugin_path):
+        if os.path.exists(gcc_plugin_path):
             async with aiofiles.open(os.path.join(gcc_plugin_path, 'randomize_layout_seed.h'), 'w') as fp:
                 await fp.write(KERNEL_SEED)
 
         certs_path = os.path.join(self.checkout_path, 'certs')
-        if await run_async(os.path.exists, certs_path):
+        if os.path.exists(certs_path):
             async with aiofiles.open(os.path.join(certs_path, 'signing_key.pem'), 'w') as fp:
                 await fp.write(KERNEL_MODULE_SIGNING_KEY)
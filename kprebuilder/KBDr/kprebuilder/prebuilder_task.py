@@ -9,124 +9,220 @@ from KBDr.kclient_models.kprebuilder import *
 from .checkout_manager import CheckoutManager
 from .utils import *
 from .analyze_binary import compare_binaries_subutil
+from .result_cache import ResultCache
+
+def _stash_objects(checkout_path: str, target_objects: List[str], suffix: str):
+    # rename(2) in place of a mv process per object;
+    for target_object in target_objects:
+        try:
+            os.rename(
+                os.path.join(checkout_path, target_object),
+                os.path.join(checkout_path, target_object[:-2] + suffix)
+            )
+        except FileNotFoundError:
+            pass
+
+def _remove_if_exists(*paths: str):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
 
 class PrebuildTask(TaskBase):
 
     async def pull_from_kcache(self, kcache_key: str):
         await self.report_job_log('Pulling source from kcache')
-        kcache_local_path = os.path.join(self.cwd, KCACHE_FILENAME)
-        await self.storage_backend.download_resource(kcache_key, kcache_local_path)
 
         checkout_path = os.path.join(self.cwd, 'linux')
-        await run_async(os.makedirs, checkout_path)
+        os.makedirs(checkout_path)
 
-        # untar;
+        # untar while downloading, the archive never touches the disk;
         proc = await asp.create_subprocess_exec(
             'tar', '-x', '--use-compress-program=zstdmt',
-            '-f', kcache_local_path, '-C', checkout_path,
-            stdin=asp.DEVNULL, stdout=asp.DEVNULL, stderr=asp.DEVNULL
+            '-f', '-', '-C', checkout_path,
+            stdin=asp.PIPE, stdout=asp.DEVNULL, stderr=asp.DEVNULL
         )
+        try:
+            async for chunk in self.storage_backend.download_resource_stream(kcache_key):
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+            proc.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # tar quit early, its exit code tells why;
+            pass
+        except BaseException:
+            proc.kill()
+            await proc.wait()
+            raise
         code = await proc.wait()
         if code != 0:
             raise JobExceptionError('kprebuilder.FailedUntarError', f'Failed to untar the {KCACHE_FILENAME}')
 
-        # delete the kcache.ztd;
-        await run_async(os.remove, kcache_local_path)
         return checkout_path
 
-    async def on_task(self):
-        self.argument = kPreBuilderArgument.model_validate(self.argument.model_dump())
-        checkout_path = await self.pull_from_kcache(self.argument.cacheKey)
-        async with aiofiles.open(os.path.join(checkout_path, 'kcache.json')) as fp:
-            kcache_cfg = json.loads(await fp.read())
-
-        make_args = [
-            'ARCH=' + {'amd64': 'x86_64', '386': 'i386'}[kcache_cfg["kernel-arch"]],
-            f'CC={kcache_cfg["compiler"]}', f'LD={kcache_cfg["linker"]}'
-        ]
-
-        checkout_mgr = CheckoutManager(checkout_path)
-        ret: List[PatchResult] = []
-
-        for i, patch in enumerate(self.argument['patches']):
-            patch_set = PatchSet(patch)
-
-            if not (await checkout_mgr.apply_patch(patch)):
-                await self.report_job_log(f'Unsuccessful patch application: {i}')
-                ret.append(PatchResult(
-                    status=PatchResultStatus.patchUnapplicable,
-                    modifiedFiles=[]
-                ))
-                # reverse back;
-                if not (await checkout_mgr.apply_reverse_patch(patch)):
-                    raise JobExceptionError('kprebuilder.PatchReverseFailed', 'Reverse patch unapplicable')
-                continue
+    async def load_patches(self) -> List[str]:
+        if self.argument.patchRefs is None:
+            return self.argument.patches
+        patch_dir = os.path.join(self.cwd, 'patches')
+        os.makedirs(patch_dir, exist_ok=True)
+        # identical refs are only downloaded once;
+        loaded = dict[str, str]()
+        patches = []
+        for ref in self.argument.patchRefs:
+            if ref.key not in loaded:
+                local_path = os.path.join(patch_dir, f'{len(loaded)}.patch')
+                await self.storage_backend.download_resource(ref.key, local_path)
+                async with aiofiles.open(local_path) as fp:
+                    loaded[ref.key] = await fp.read()
+            patches.append(loaded[ref.key])
+        return patches
+
+    async def prebuild_patch(self, i: int, patch: str, checkout_mgr: CheckoutManager, checkout_path: str, make_args: List[str]) -> dict | asyncio.Task:
+        patch_set = PatchSet(patch)
+
+        if not (await checkout_mgr.apply_patch(patch)):
+            await self.report_job_log(f'Unsuccessful patch application: {i}')
+            # reverse back;
+            if not (await checkout_mgr.apply_reverse_patch(patch)):
+                raise JobExceptionError('kprebuilder.PatchReverseFailed', 'Reverse patch unapplicable')
+            # same shape as the other outcomes, it goes through the result cache as is;
+            return { 'patch-status': 'patch-unapplicable', 'modified-files': [] }
+        else:
+            await self.report_job_log(f'Successful patch application: {i}')
+        await checkout_mgr.ensure_reproducible()
+
+        # pull compile command;
+        target_objects = []
+        for patched_file in patch_set:
+            fname = patched_file.path
+            if fname[-2:] == '.c':
+                target_objects.append(fname[:-2] + '.o')
             else:
-                await self.report_job_log(f'Successful patch application: {i}')
-            await checkout_mgr.ensure_reproducible()
-
-            # pull compile command;
-            target_objects = []
-            for patched_file in patch_set:
-                fname = patched_file.path
-                if fname[-2:] == '.c':
-                    target_objects.append(fname[:-2] + '.o')
-                else:
-                    await self.report_job_log(f'Neglecting file {fname} in patch {i}')
-            
-            proc = await asp.create_subprocess_exec(
-                'make', *make_args,
-                '-j4', 'KCFLAGS="-fno-inline"',
-                *target_objects,
-                cwd=checkout_path,
-                stdin=asp.DEVNULL,
-                stdout=asp.DEVNULL,
-                stderr=asp.DEVNULL
-            )
-            code = await proc.wait()
+                await self.report_job_log(f'Neglecting file {fname} in patch {i}')
 
-            if code != 0:
-                ret.append({ 'patch-status': 'compilation-error', 'modified-files': [] })
-                if not (await checkout_mgr.apply_reverse_patch(patch)):
-                    raise JobExceptionError('Reverse patch unapplicable')
-                continue
+        proc = await asp.create_subprocess_exec(
+            'make', *make_args,
+            '-j4', 'KCFLAGS="-fno-inline"',
+            *target_objects,
+            cwd=checkout_path,
+            stdin=asp.DEVNULL,
+            stdout=asp.DEVNULL,
+            stderr=asp.DEVNULL
+        )
+        code = await proc.wait()
 
-            patch_ret = { 'patch-status': 'success' }
+        if code != 0:
+            if not (await checkout_mgr.apply_reverse_patch(patch)):
+                raise JobExceptionError('kprebuilder.PatchReverseFailed', 'Reverse patch unapplicable')
+            return { 'patch-status': 'compilation-error', 'modified-files': [] }
 
-            async def _mv_target_object(target_object: str):
-                proc = await asp.create_subprocess_exec('mv', target_object, target_object[:-2] + '_new.o', cwd=checkout_path)
-                await proc.wait()
-            await asyncio.gather(*list(map(_mv_target_object, target_objects)))
+        # per-patch names, so the next patch can build while this one is compared;
+        await run_async(_stash_objects, checkout_path, target_objects, f'_new_{i}.o')
 
-            if not (await checkout_mgr.apply_reverse_patch(patch)):
-                raise JobExceptionError('Reverse patch unapplicable')
-
-            proc = await asp.create_subprocess_exec(
-                'make', *make_args, '-j4',
-                'KCFLAGS="-fno-inline"',
-                *target_objects,
-                cwd=checkout_path,
-                stdin=asp.DEVNULL,
-                stdout=asp.DEVNULL,
-                stderr=asp.DEVNULL
-            )
-            await proc.wait()
+        if not (await checkout_mgr.apply_reverse_patch(patch)):
+            raise JobExceptionError('kprebuilder.PatchReverseFailed', 'Reverse patch unapplicable')
 
-            async def _compare_binary(target_object: str) -> dict:
-                modified_functions = await compare_binaries_subutil(
-                    os.path.join(checkout_path, target_object), 
-                    os.path.join(checkout_path, target_object[:-2] + '_new.o'), 
-                    target_object[:-2] + '.c'
-                )
-                proc = await asp.create_subprocess_exec('rm', target_object[:-2] + '_new.o', cwd=checkout_path)
-                await proc.wait()
-                return {
-                    'filename': target_object[:-2] + '.c',
-                    'modified-functions': modified_functions
-                }
+        proc = await asp.create_subprocess_exec(
+            'make', *make_args, '-j4',
+            'KCFLAGS="-fno-inline"',
+            *target_objects,
+            cwd=checkout_path,
+            stdin=asp.DEVNULL,
+            stdout=asp.DEVNULL,
+            stderr=asp.DEVNULL
+        )
+        await proc.wait()
 
-            patch_ret['modified-files'] = await asyncio.gather(*list(map(_compare_binary, target_objects)))
+        await run_async(_stash_objects, checkout_path, target_objects, f'_old_{i}.o')
+        return asyncio.create_task(self.compare_patch_objects(i, checkout_path, target_objects))
 
-            ret.append(patch_ret)
+    async def compare_patch_objects(self, i: int, checkout_path: str, target_objects: List[str]) -> dict:
+        async def _compare_binary(j: int, target_object: str):
+            modified_functions = await compare_binaries_subutil(
+                os.path.join(checkout_path, target_object[:-2] + f'_old_{i}.o'),
+                os.path.join(checkout_path, target_object[:-2] + f'_new_{i}.o'),
+                target_object[:-2] + '.c'
+            )
+            return j, {
+                'filename': target_object[:-2] + '.c',
+                'modified-functions': modified_functions
+            }
+
+        # report each object as it finishes, keep the result in patch order;
+        modified_files = [None] * len(target_objects)
+        try:
+            for fut in asyncio.as_completed([_compare_binary(j, t) for j, t in enumerate(target_objects)]):
+                j, modified_file = await fut
+                await self.report_job_log(f'Compared {modified_file["filename"]} in patch {i}')
+                modified_files[j] = modified_file
+        finally:
+            await run_async(_remove_if_exists, *(
+                os.path.join(checkout_path, target_object[:-2] + f'_{suffix}_{i}.o')
+                for target_object in target_objects for suffix in ('old', 'new')
+            ))
+
+        return {
+            'patch-status': 'success',
+            'modified-files': modified_files
+        }
 
+    async def on_task(self):
+        # the fields are plain JSON values already, a shallow dict is enough;
+        self.argument = kPreBuilderArgument.model_validate(dict(self.argument))
+        kcache_key = self.argument.kCache.key
+        patches = await self.load_patches()
+        digests = [kPreBuilderArgument.patch_digest(patch) for patch in patches]
+
+        # identical patches are prebuilt once;
+        prebuilt = {}
+        # tag noCache=1 forces a rebuild of every patch;
+        cache = None if self.job_ctx.tags.get('noCache') == '1' else ResultCache()
+        if cache is not None:
+            kcache_generation = await self.storage_backend.get_resource_generation(kcache_key)
+            for digest in set(digests):
+                cached = await cache.get(ResultCache.make_key(kcache_key, kcache_generation, digest))
+                if cached is not None:
+                    prebuilt[digest] = cached
+        cached_digests = set(prebuilt)
+
+        if len(cached_digests) < len(set(digests)):
+            checkout_path = await self.pull_from_kcache(kcache_key)
+            async with aiofiles.open(os.path.join(checkout_path, 'kcache.json')) as fp:
+                kcache_cfg = json.loads(await fp.read())
+
+            make_args = [
+                'ARCH=' + {'amd64': 'x86_64', '386': 'i386'}[kcache_cfg["kernel-arch"]],
+                f'CC={kcache_cfg["compiler"]}', f'LD={kcache_cfg["linker"]}'
+            ]
+
+            checkout_mgr = CheckoutManager(checkout_path)
+
+            try:
+                # builds share the tree and run in order, comparisons overlap later builds;
+                for i, (patch, digest) in enumerate(zip(patches, digests)):
+                    if digest in cached_digests:
+                        await self.report_job_log(f'Patch {i} is cached, reusing its result')
+                    elif digest in prebuilt:
+                        await self.report_job_log(f'Patch {i} is a duplicate, reusing its result')
+                    else:
+                        prebuilt[digest] = await self.prebuild_patch(i, patch, checkout_mgr, checkout_path, make_args)
+                for digest, result in prebuilt.items():
+                    if isinstance(result, asyncio.Task):
+                        prebuilt[digest] = await result
+            finally:
+                for result in prebuilt.values():
+                    if isinstance(result, asyncio.Task):
+                        result.cancel()
+
+            if cache is not None:
+                # compilation errors may come from the environment, they're retried;
+                for digest, result in prebuilt.items():
+                    if digest not in cached_digests and result['patch-status'] != 'compilation-error':
+                        await cache.put(ResultCache.make_key(kcache_key, kcache_generation, digest), result)
+                await cache.evict()
+        else:
+            await self.report_job_log('All patches are cached, skipping the kcache')
+
+        ret: List[dict] = [prebuilt[digest] for digest in digests]
         return ret
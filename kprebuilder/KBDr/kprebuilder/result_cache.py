@@ -0,0 +1,71 @@
+# result_cache.py
+import os, json, hashlib, tempfile
+from pydantic_core import to_jsonable_python
+from KBDr.kcore import run_async
+
+RESULT_CACHE_PATH = os.environ.get(
+    'KPREBUILDER_RESULT_CACHE_PATH',
+    os.path.join(tempfile.gettempdir(), 'kprebuilder-results')
+)
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('KPREBUILDER_RESULT_CACHE_MAX_ENTRIES', 4096))
+
+def _read_json(path: str):
+    try:
+        with open(path, 'r') as fp:
+            value = json.load(fp)
+    except (FileNotFoundError, ValueError):
+        return None
+    # a hit counts as a use, eviction goes by mtime;
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return value
+
+def _write_json(path: str, value):
+    # write aside and rename, readers never see a partial entry;
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as fp:
+        json.dump(value, fp)
+    os.replace(tmp_path, path)
+
+def _evict(root: str, max_entries: int):
+    # drop the least recently used entries beyond the limit;
+    with os.scandir(root) as it:
+        entries = [
+            (entry.stat().st_mtime_ns, entry.path)
+            for entry in it if entry.name.endswith('.json')
+        ]
+    if len(entries) <= max_entries:
+        return
+    entries.sort()
+    for _, path in entries[:len(entries) - max_entries]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+class ResultCache:
+
+    def __init__(self, root: str=RESULT_CACHE_PATH, max_entries: int=RESULT_CACHE_MAX_ENTRIES):
+        self.root = root
+        self.max_entries = max_entries
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def make_key(kcache_key: str, kcache_generation: int, patch_digest: str) -> str:
+        # the make arguments come from the kcache itself, its key covers them;
+        # the generation tells a rebuilt kcache under the same key apart;
+        return hashlib.sha256(f'{kcache_key}#{kcache_generation}\0{patch_digest}'.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f'{key}.json')
+
+    async def get(self, key: str):
+        return await run_async(_read_json, self._path(key))
+
+    async def put(self, key: str, value):
+        await run_async(_write_json, self._path(key), to_jsonable_python(value))
+
+    async def evict(self):
+        await run_async(_evict, self.root, self.max_entries)
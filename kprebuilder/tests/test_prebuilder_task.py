@@ -0,0 +1,95 @@
+import os, json, asyncio
+from types import SimpleNamespace
+
+from KBDr.kcore import JobResource
+from KBDr.kprebuilder import prebuilder_task
+from KBDr.kprebuilder.prebuilder_task import PrebuildTask
+from KBDr.kprebuilder.result_cache import ResultCache
+
+PATCH = '''diff --git a/fs/file.c b/fs/file.c
+--- a/fs/file.c
++++ b/fs/file.c
+@@ -1,1 +1,1 @@
+-int x = 0;
++int x = 1;
+'''
+
+class _UnapplicableCheckout:
+
+    def __init__(self, checkout_path: str):
+        self.checkout_path = checkout_path
+
+    async def apply_patch(self, patch: str):
+        return False
+
+    async def apply_reverse_patch(self, patch: str):
+        return True
+
+def _make_task(tmp_path, tags: dict):
+    task = PrebuildTask.__new__(PrebuildTask)
+    task.cwd = str(tmp_path)
+    task.argument = {
+        'kCache': JobResource(key='kcache/linux.tar.zst', storageUri='local://kcache/linux.tar.zst'),
+        'patches': [PATCH]
+    }
+    task.job_ctx = SimpleNamespace(tags=tags)
+    task.logs = []
+    task.pulls = 0
+
+    async def report_job_log(message):
+        task.logs.append(message)
+
+    async def pull_from_kcache(kcache_key: str):
+        task.pulls += 1
+        checkout_path = os.path.join(task.cwd, 'linux')
+        os.makedirs(checkout_path, exist_ok=True)
+        with open(os.path.join(checkout_path, 'kcache.json'), 'w') as fp:
+            json.dump({'kernel-arch': 'amd64', 'compiler': 'gcc', 'linker': 'ld'}, fp)
+        return checkout_path
+
+    async def get_resource_generation(key: str):
+        return 1
+
+    task.report_job_log = report_job_log
+    task.pull_from_kcache = pull_from_kcache
+    task.storage_backend = SimpleNamespace(get_resource_generation=get_resource_generation)
+    return task
+
+def test_unapplicable_patch_with_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(prebuilder_task, 'CheckoutManager', _UnapplicableCheckout)
+    class _Cache(ResultCache):
+        def __init__(self):
+            super().__init__(str(tmp_path / 'cache'))
+    monkeypatch.setattr(prebuilder_task, 'ResultCache', _Cache)
+
+    expected = [{ 'patch-status': 'patch-unapplicable', 'modified-files': [] }]
+    task = _make_task(tmp_path / 'first', {})
+    assert asyncio.run(task.on_task()) == expected
+    assert task.pulls == 1
+
+    # the second run is served from the cache, in the same shape;
+    task = _make_task(tmp_path / 'second', {})
+    assert asyncio.run(task.on_task()) == expected
+    assert task.pulls == 0
+
+def test_result_cache_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = ResultCache.make_key('kcache/linux.tar.zst', 1, 'digest')
+    value = {
+        'patch-status': 'success',
+        'modified-files': [{
+            'filename': 'fs/file.c',
+            'modified-functions': [{
+                'function-name': 'f',
+                'instruction-count-before': 3,
+                'instruction-count-after': 4
+            }]
+        }]
+    }
+
+    async def round_trip():
+        assert await cache.get(key) is None
+        await cache.put(key, value)
+        return await cache.get(key)
+
+    assert asyncio.run(round_trip()) == value
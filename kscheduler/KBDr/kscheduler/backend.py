@@ -1,47 +1,182 @@
-import aiosqlite
+import aiosqlite, asyncio, os, traceback
+from contextlib import asynccontextmanager
 from KBDr.kcore import *
-from typing import Annotated, Dict
+from typing import Annotated, Dict, get_args
 from fastapi import FastAPI, Query, Path, HTTPException
-from fastapi.responses import RedirectResponse
-from .utils import JobIDRegex, SortingModes, PaginatedResult
+from fastapi.responses import RedirectResponse, Response
+from .utils import JobIDPath, SortingModes, PaginatedResult, SystemLogMessage, JobLogMessage
 from .config import SchedulerConfig
 from pydantic_core import from_json, to_json
 from datetime import UTC, datetime
 
-DigestTupleToModel = lambda digestTuple: JobDigest(
-    jobId=digestTuple[0],
-    createdTime=digestTuple[1],
-    modifiedTime=digestTuple[2],
-    status=digestTuple[3],
+# rows come from our own tables, only convert the columns and skip validation;
+DigestTupleToModel = lambda digestTuple: JobDigest.model_construct(
+    jobId=JobId(digestTuple[0]),
+    createdTime=datetime.fromisoformat(digestTuple[1]),
+    modifiedTime=datetime.fromisoformat(digestTuple[2]),
+    status=JobStatus(digestTuple[3]),
     currentWorkerHostname=digestTuple[4],
     currentWorker=digestTuple[5]
 )
 
+# worker payloads nest resources and exceptions, those still need validation;
 WorkerTupleToModel = lambda workerTuple: JobWorker(
     workerType=workerTuple[2],
     workerArgument=from_json(workerTuple[3]),
     workerResult=from_json(workerTuple[4])
 )
 
-JobLogTupleToModel = lambda jobLogTuple: JobLog(
-    timeStamp=jobLogTuple[0],
-    jobId=jobLogTuple[1],
+JobLogTupleToModel = lambda jobLogTuple: JobLog.model_construct(
+    timeStamp=datetime.fromisoformat(jobLogTuple[0]),
+    jobId=JobId(jobLogTuple[1]),
     workerType=jobLogTuple[2],
     workerHostname=jobLogTuple[3],
     content=from_json(jobLogTuple[4])
 )
 
-SystemLogTupleToModel = lambda systemLogTuple: SystemLog(
-    timeStamp=systemLogTuple[0],
+SystemLogTupleToModel = lambda systemLogTuple: SystemLog.model_construct(
+    timeStamp=datetime.fromisoformat(systemLogTuple[0]),
     workerType=systemLogTuple[1],
     workerHostname=systemLogTuple[2],
     content=from_json(systemLogTuple[3])
 )
 
-KEY_EXTRACTOR = {
-    'modifiedTime': lambda x: x.modifiedTime,
-    'createdTime': lambda x: x.createdTime
+def _now_iso() -> str:
+    # microsecond precision; the modifiedTime guards compare these strictly;
+    return datetime.now(UTC).isoformat()
+
+def _json_response(result: BaseModel) -> Response:
+    # serialized once by pydantic-core, FastAPI skips revalidating the page;
+    return Response(model_dump_json_bytes(result), media_type='application/json')
+
+READ_POOL_SIZE = max(4, os.cpu_count() or 1)
+LOG_BATCH_SIZE = 500
+LOG_FLUSH_RETRIES = 3
+STATEMENT_CACHE_SIZE = 256
+
+# statements are module constants, so every call hands the connection's
+# statement cache the same text and skips the re-prepare;
+# live jobs, spelled out so the planner can match the partial index;
+_SQL_ACTIVE_STATUSES = ', '.join(
+    f"'{status.value}'" for status in (JobStatus.Pending, JobStatus.InProgress, JobStatus.Waiting)
+)
+_SQL_ABORT_LEFT_OVER_JOBS = f"""
+UPDATE jobDigest
+SET `status`=?, currentWorkerHostname=?, modifiedTime=?
+WHERE `status` IN ({_SQL_ACTIVE_STATUSES});
+"""
+# also built on databases created before they existed;
+_SQL_CREATE_INDEXES = f"""
+CREATE INDEX IF NOT EXISTS jobDigestActiveIndex ON jobDigest (`status`) WHERE `status` IN ({_SQL_ACTIVE_STATUSES});
+CREATE INDEX IF NOT EXISTS jobTagKVIndex ON jobTag (tagKey, tagValue, jobId);
+"""
+# digest (0), workers (1) and tags (2) of one job in one round trip;
+# worker rows line up with WorkerTupleToModel;
+_SQL_GET_JOB = """
+SELECT 0, createdTime, modifiedTime, `status`, currentWorkerHostname, currentWorker
+    FROM jobDigest WHERE jobId=?1
+UNION ALL
+SELECT 1, workerIndex, workerType, workerArgument, workerResult, NULL
+    FROM jobWorker WHERE jobId=?1
+UNION ALL
+SELECT 2, tagKey, tagValue, NULL, NULL, NULL
+    FROM jobTag WHERE jobId=?1
+ORDER BY 1, 2;
+"""
+_SQL_GET_JOB_DIGEST = "SELECT * FROM jobDigest WHERE jobId=?;"
+_SQL_INSERT_SYSTEM_LOG = """
+INSERT INTO systemLog(timeStamp, workerType, workerHostname, content)
+VALUES(?, ?, ?, ?);
+"""
+_SQL_INSERT_JOB_LOG = """
+INSERT INTO jobLog(timeStamp, jobId, workerType, workerHostname, content)
+VALUES(?, ?, ?, ?, ?);
+"""
+_SQL_FOCUS_JOB = """
+UPDATE jobDigest
+SET `status`=?, currentWorkerHostname=?, modifiedTime=?
+WHERE jobId=? AND currentWorkerHostname=? AND (`status`=? OR `status`=?) AND modifiedTime<?;
+"""
+_SQL_RESTART_JOB = """
+UPDATE jobDigest
+SET `status`=?, modifiedTime=?, currentWorker=?
+WHERE jobId=? AND currentWorkerHostname=? AND (`status`=? OR `status`=?) AND modifiedTime<?;
+"""
+_SQL_INSERT_JOB_DIGEST = """
+INSERT INTO jobDigest(jobId, createdTime, modifiedTime, `status`, currentWorkerHostname, currentWorker)
+VALUES(NULL, ?, ?, ?, ?, ?)
+RETURNING jobId;
+"""
+_SQL_INSERT_JOB_WORKER = """
+INSERT INTO jobWorker(jobId, workerIndex, workerType, workerArgument, workerResult)
+VALUES(?, ?, ?, ?, ?);
+"""
+_SQL_INSERT_JOB_TAG = "INSERT INTO jobTag(jobId, tagKey, tagValue) VALUES(?, ?, ?);"
+_SQL_UPDATE_WORKER_RESULT = "UPDATE jobWorker SET workerResult=? WHERE jobId=? AND workerIndex=?;"
+_SQL_ADVANCE_JOB = """
+UPDATE jobDigest
+SET `status`=?, currentWorkerHostname=?, currentWorker=?, modifiedTime=?
+WHERE jobId=? AND `status`=? AND currentWorkerHostname=? AND currentWorker=? AND modifiedTime<?;
+"""
+_SQL_GET_WORKER_TYPE = "SELECT workerType FROM jobWorker WHERE jobId=? AND workerIndex=?;"
+_SQL_FINISH_JOB = "UPDATE jobDigest SET `status`=? WHERE jobId=?;"
+_SQL_ABORT_JOB = """
+UPDATE jobDigest
+SET `status`=?
+WHERE jobId=? AND currentWorkerHostname=? AND (`status`=? OR `status`=?);
+"""
+# pages over a whole table take their total from a separate COUNT, a
+# COUNT(*) OVER() would walk every row for each page; filtered pages carry it;
+# sortBy only picks between these, one constant per mode;
+_SQL_GET_JOBS_PAGE = {
+    sortBy: f"SELECT * FROM jobDigest ORDER BY {sortBy} DESC LIMIT ? OFFSET ?;"
+    for sortBy in get_args(SortingModes)
 }
+_SQL_COUNT_JOBS = "SELECT COUNT(*) FROM jobDigest;"
+_SQL_GET_JOB_LOG_PAGE = """
+SELECT *, COUNT(*) OVER() FROM jobLog
+WHERE jobId=?
+ORDER BY timeStamp DESC LIMIT ? OFFSET ?;
+"""
+_SQL_COUNT_JOB_LOG = "SELECT COUNT(*) FROM jobLog WHERE jobId=?;"
+_SQL_GET_JOB_TAGS = "SELECT * FROM jobTag WHERE jobId=?;"
+_SQL_GET_JOB_TAG = "SELECT * FROM jobTag WHERE jobId=? AND tagKey=?;"
+_SQL_UPSERT_JOB_TAG = """
+INSERT INTO jobTag(jobId, tagKey, tagValue) VALUES(?, ?, ?)
+ON CONFLICT(jobId, tagKey) DO UPDATE SET tagValue=excluded.tagValue;
+"""
+_SQL_GET_TAG_KEYS_PAGE = "SELECT DISTINCT tagKey FROM jobTag ORDER BY tagKey ASC LIMIT ? OFFSET ?;"
+_SQL_COUNT_TAG_KEYS = "SELECT COUNT(DISTINCT tagKey) FROM jobTag;"
+_SQL_SEARCH_KEY_PAGE = """
+SELECT *, COUNT(*) OVER() FROM jobTag
+WHERE tagKey=?
+ORDER BY jobId DESC LIMIT ? OFFSET ?;
+"""
+_SQL_COUNT_SEARCH_KEY = "SELECT COUNT(*) FROM jobTag WHERE tagKey=?;"
+_SQL_SEARCH_KEY_VALUE_PAGE = """
+SELECT *, COUNT(*) OVER() FROM jobTag
+WHERE tagKey=? AND tagValue=?
+ORDER BY jobId DESC LIMIT ? OFFSET ?;
+"""
+_SQL_COUNT_SEARCH_KEY_VALUE = "SELECT COUNT(*) FROM jobTag WHERE tagKey=? AND tagValue=?;"
+_SQL_GET_SYSTEM_LOG_PAGE = "SELECT * FROM systemLog ORDER BY timeStamp DESC LIMIT ? OFFSET ?;"
+_SQL_COUNT_SYSTEM_LOG = "SELECT COUNT(*) FROM systemLog;"
+_SQL_GET_ALL_JOB_LOG_PAGE = "SELECT * FROM jobLog ORDER BY timeStamp DESC LIMIT ? OFFSET ?;"
+_SQL_COUNT_ALL_JOB_LOG = "SELECT COUNT(*) FROM jobLog;"
+
+# per-connection settings, safe to re-run on every open;
+CONNECTION_PRAGMAS = (
+    'PRAGMA busy_timeout=5000;',
+    'PRAGMA synchronous=NORMAL;',
+    'PRAGMA cache_size=-32000;',
+    'PRAGMA temp_store=MEMORY;',
+    'PRAGMA mmap_size=268435456;'
+)
+# database-wide settings, issued by the writer;
+WRITER_PRAGMAS = (
+    'PRAGMA journal_mode=WAL;',
+    'PRAGMA wal_autocheckpoint=1000;'
+)
 
 class SchedulerBackend:
 
@@ -49,10 +184,44 @@ class SchedulerBackend:
         self.config = config
         self._backend_conn_str = config.dbPath
         self._storage_backend: AbstractStorageBackend = None
+        self._writer: aiosqlite.Connection = None
+        self._write_lock = asyncio.Lock()
+        self._read_pool = asyncio.Queue[aiosqlite.Connection]()
+        self._log_queue = asyncio.Queue[Tuple[bool, tuple, asyncio.Future] | None]()
+        self._log_flusher_task: asyncio.Task = None
+        self._log_closing = False
+
+    async def _connect(self, read_only: bool=False) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self._backend_conn_str, cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in CONNECTION_PRAGMAS:
+            await conn.execute(pragma)
+        for pragma in (('PRAGMA query_only=true;', ) if read_only else WRITER_PRAGMAS):
+            await conn.execute(pragma)
+        return conn
+
+    @asynccontextmanager
+    async def _read(self):
+        # statements go through the connection, one thread hop each;
+        conn = await self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put_nowait(conn)
+
+    @asynccontextmanager
+    async def _write(self):
+        # writes funnel through the writer, one transaction at a time;
+        async with self._write_lock:
+            try:
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            await self._writer.commit()
 
     async def _create_db(self):
-        async with self._db_conn.cursor() as cur:
-            await cur.executescript('\n'.join((
+        async with self._write() as db:
+            await db.executescript('\n'.join((
                 "CREATE TABLE jobDigest (",
                 "jobId INTEGER PRIMARY KEY AUTOINCREMENT,",
                 "createdTime TEXT,",
@@ -62,7 +231,7 @@ class SchedulerBackend:
                 "currentWorker INT",
                 ");"
             )))
-            await cur.executescript('\n'.join((
+            await db.executescript('\n'.join((
                 "CREATE TABLE jobWorker (",
                 "jobId INTEGER,",
                 "workerIndex INTEGER,",
@@ -72,7 +241,7 @@ class SchedulerBackend:
                 "CONSTRAINT mkey PRIMARY KEY(jobId, workerIndex)",
                 ");"
             )))
-            await cur.executescript('\n'.join((
+            await db.executescript('\n'.join((
                 "CREATE TABLE jobTag (",
                 "jobId INTEGER,",
                 "tagKey TEXT,",
@@ -80,7 +249,7 @@ class SchedulerBackend:
                 "CONSTRAINT mkey PRIMARY KEY(jobId, tagKey)",
                 ");"
             )))
-            await cur.executescript('\n'.join((
+            await db.executescript('\n'.join((
                 "CREATE TABLE jobLog (",
                 "timeStamp TEXT,",
                 "jobId INTEGER,",
@@ -89,7 +258,7 @@ class SchedulerBackend:
                 "content TEXT",
                 ");"
             )))
-            await cur.executescript('\n'.join((
+            await db.executescript('\n'.join((
                 "CREATE TABLE systemLog (",
                 "timeStamp TEXT,",
                 "workerType TEXT,",
@@ -97,202 +266,197 @@ class SchedulerBackend:
                 "content TEXT",
                 ");"
             )))
-            await cur.executescript('\n'.join((
+            await db.executescript('\n'.join((
                 "CREATE TABLE authenticationToken (",
                 "token TEXT PRIMARY KEY,",
                 "expirationDate TEXT",
                 ");"
             )))
-            await cur.executescript("CREATE INDEX jobDigestModifiedTimeIndex ON jobDigest (modifiedTime);")
-            await cur.executescript("CREATE INDEX jobDigestCreatedTimeIndex ON jobDigest (createdTime);")
-            await cur.executescript("CREATE INDEX jobWorkerIndex ON jobWorker (jobId);")
-            await cur.executescript("CREATE INDEX jobTagIndex ON jobTag (jobId);")
-            await cur.executescript("CREATE INDEX jobTagKeyIndex ON jobTag (tagKey);")
-            await cur.executescript("CREATE INDEX jobLogTSIndex ON jobLog (timeStamp);")
-            await cur.executescript("CREATE INDEX jobLogIdIndex ON jobLog (jobId);")
-            await cur.executescript("CREATE INDEX systemLogTSIndex ON systemLog (timeStamp);")
-        await self._db_conn.commit()
+            await db.executescript("CREATE INDEX jobDigestModifiedTimeIndex ON jobDigest (modifiedTime);")
+            await db.executescript("CREATE INDEX jobDigestCreatedTimeIndex ON jobDigest (createdTime);")
+            await db.executescript("CREATE INDEX jobWorkerIndex ON jobWorker (jobId);")
+            await db.executescript("CREATE INDEX jobTagIndex ON jobTag (jobId);")
+            await db.executescript("CREATE INDEX jobTagKeyIndex ON jobTag (tagKey);")
+            await db.executescript("CREATE INDEX jobLogTSIndex ON jobLog (timeStamp);")
+            await db.executescript("CREATE INDEX jobLogIdIndex ON jobLog (jobId);")
+            await db.executescript("CREATE INDEX systemLogTSIndex ON systemLog (timeStamp);")
 
     async def _shutdown_left_over_jobs(self):
-        async with self._db_conn.cursor() as cur:
-            ts = datetime.now(UTC).isoformat()
-            await cur.execute(
-                "UPDATE jobDigest SET `status`=?, currentWorkerHostname=?, modifiedTime=? \
-                WHERE `status`=? OR `status`=? OR `status`=?;",
-                (JobStatus.Aborted, '', ts, JobStatus.InProgress, JobStatus.Pending, JobStatus.Waiting)
+        async with self._write() as db:
+            ts = _now_iso()
+            await db.execute(
+                _SQL_ABORT_LEFT_OVER_JOBS,
+                (JobStatus.Aborted, '', ts)
             )
-        await self._db_conn.commit()
 
     async def get_job(
         self,
         jobId: str
     ) -> JobContext | None:
         jobId = JobId(jobId)
-        async with self._db_conn.cursor() as cur:
-            await cur.execute(
-                "SELECT * FROM jobDigest WHERE jobId=?",
-                (jobId, )
-            )
-            digest = await cur.fetchall()
-            if len(digest) == 0:
-                return None
-            digest = DigestTupleToModel(digest[0])
-
-            await cur.execute(
-                "SELECT * FROM jobWorker WHERE jobId=? ORDER BY workerIndex ASC",
-                (jobId, )
-            )
-            workers: List[JobWorker] = list(map(WorkerTupleToModel, await cur.fetchall()))
+        async with self._read() as db:
+            rows = await db.execute_fetchall(_SQL_GET_JOB, (jobId, ))
+        if len(rows) == 0 or rows[0][0] != 0:
+            return None
+        digest = DigestTupleToModel((jobId, *rows[0][1:6]))
+        workers: List[JobWorker] = [WorkerTupleToModel(row) for row in rows if row[0] == 1]
+        tags = {row[1]: row[2] for row in rows if row[0] == 2}
+        return JobContext(
+            **digest.model_dump(),
+            jobWorkers=workers,
+            tags=tags
+        )
 
-            await cur.execute(
-                "SELECT * FROM jobTag WHERE jobId=?",
-                (jobId, )
-            )
-            tagKVpairs = await cur.fetchall()
-            tags = dict[str, str]()
-            for kv_pair in tagKVpairs:
-                tags[kv_pair[1]] = kv_pair[2]
-
-            return JobContext(
-                **digest.model_dump(),
-                jobWorkers=workers,
-                tags=tags
-            )
+    async def get_job_digest(self, jobId: JobId) -> JobDigest | None:
+        # the digest row alone, for callers that don't need workers or tags;
+        async with self._read() as db:
+            rows = await db.execute_fetchall(_SQL_GET_JOB_DIGEST, (jobId, ))
+        return DigestTupleToModel(rows[0]) if len(rows) != 0 else None
+
+    def _queue_log(self, is_job_log: bool, row: tuple) -> asyncio.Future:
+        # resolves once the row is committed, the MQ message is acked after that;
+        if self._log_closing:
+            raise IOError('Log flusher stopped')
+        future = asyncio.get_running_loop().create_future()
+        self._log_queue.put_nowait((is_job_log, row, future))
+        return future
+
+    async def insert_system_log(self, log: SystemLogMessage):
+        await self._queue_log(
+            False,
+            (log.timeStamp.astimezone(UTC).isoformat(), log.workerType, log.workerHostname, bytes(log.content))
+        )
 
-    async def insert_system_log(self, log: SystemLog):
-        async with self._db_conn.cursor() as cur:
-            await cur.execute(
-                "INSERT INTO systemLog( \
-                    timeStamp, workerType, \
-                    workerHostname, content \
-                ) VALUES(?, ?, ?, ?) \
-                ;",
-                (log.timeStamp.astimezone(UTC).isoformat(), log.workerType, log.workerHostname, to_json(log.content))
+    async def insert_job_log(self, log: JobLogMessage):
+        await self._queue_log(
+            True,
+            (
+                log.timeStamp.astimezone(UTC).isoformat(), JobId._from_hex(log.jobId),
+                log.workerType, log.workerHostname,
+                bytes(log.content)
             )
-        await self._db_conn.commit()
-
-    async def insert_job_log(self, log: JobLog):
-        async with self._db_conn.cursor() as cur:
-            await cur.execute(
-                "INSERT INTO jobLog( \
-                    timeStamp, jobId, \
-                    workerType, workerHostname, \
-                    content \
-                ) VALUES(?, ?, ?, ?, ?) \
-                ;",
-                (
-                    log.timeStamp.astimezone(UTC).isoformat(), log.jobId,
-                    log.workerType, log.workerHostname,
-                    to_json(log.content)
+        )
+
+    async def _flush_logs(self, batch: List[Tuple[bool, tuple, asyncio.Future]]):
+        job_rows = [row for is_job_log, row, _ in batch if is_job_log]
+        system_rows = [row for is_job_log, row, _ in batch if not is_job_log]
+        async with self._write() as db:
+            if system_rows:
+                await db.executemany(
+                    _SQL_INSERT_SYSTEM_LOG,
+                    system_rows
                 )
-            )
-        await self._db_conn.commit()
+            if job_rows:
+                await db.executemany(
+                    _SQL_INSERT_JOB_LOG,
+                    job_rows
+                )
+
+    async def _log_flusher(self):
+        # whatever piled up while the last batch was written goes in the next one;
+        closing = False
+        while not closing:
+            batch = []
+            item = await self._log_queue.get()
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= LOG_BATCH_SIZE:
+                    break
+                try:
+                    item = self._log_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+            else:
+                # stop() enqueues None after the last row it accepts;
+                closing = True
+            if not batch:
+                continue
+            error = None
+            for attempt in range(LOG_FLUSH_RETRIES):
+                if attempt != 0:
+                    await asyncio.sleep(2 ** attempt)
+                try:
+                    await self._flush_logs(batch)
+                    error = None
+                    break
+                except Exception as e:
+                    traceback.print_exc()
+                    error = e
+            # a batch that still fails is handed back, its messages get requeued;
+            for _, _, future in batch:
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
 
     async def focus_job(self, request: JobFocusRequest) -> JobFocusReceipt:
-        async with self._db_conn.cursor() as cur:
-            ts = datetime.now(UTC).isoformat()
-            await cur.execute(
-                "UPDATE jobDigest SET `status`=?, currentWorkerHostname=?, modifiedTime=? \
-                WHERE jobId = ? AND currentWorkerHostname = ? AND \
-                (`status` = ? OR `status` = ?) AND modifiedTime < ?;",
+        async with self._write() as db:
+            ts = _now_iso()
+            cur = await db.execute(
+                _SQL_FOCUS_JOB,
                 (JobStatus.InProgress, request.workerHostname, ts,
                 request.jobId, '', JobStatus.Waiting, JobStatus.Pending, ts)
             )
-            if cur.rowcount == 1:
-                status = JobFocusStatus.focused
-            else:
-                status = JobFocusStatus.rejected
-        await self._db_conn.commit()
+            focused = (cur.rowcount == 1)
+        if not focused:
+            # the worker drops rejected jobs, no need for the context;
+            return JobFocusReceipt(status=JobFocusStatus.rejected)
         return JobFocusReceipt(
-            status=status,
+            status=JobFocusStatus.focused,
             jobContext=await self.get_job(str(request.jobId))
         )
 
     async def restart_job(self, job_id: JobId, restart_from: int):
-        async with self._db_conn.cursor() as cur:
-            ts = datetime.now(UTC).isoformat()
-            await cur.execute(
-                "UPDATE jobDigest SET \
-                    `status`=?, \
-                    modifiedTime=?, \
-                    currentWorker=? \
-                WHERE \
-                    jobId=? AND \
-                    currentWorkerHostname=? AND \
-                    (`status`=? OR `status`=?) AND \
-                    modifiedTime<? \
-                ;",
+        async with self._write() as db:
+            ts = _now_iso()
+            cur = await db.execute(
+                _SQL_RESTART_JOB,
                 (
                     JobStatus.Pending, ts, restart_from, job_id,
                     '', JobStatus.Aborted, JobStatus.Finished, ts
                 )
             )
             ret = (cur.rowcount == 1)
-        await self._db_conn.commit()
         if not ret:
             raise HTTPException(400, 'Failed to restart job')
 
     async def new_job(self, request: JobRequest) -> JobId:
-        async with self._db_conn.cursor() as cur:
-            ts = datetime.now(UTC).isoformat()
-            await cur.execute(
-                'INSERT INTO jobDigest( \
-                    jobId, \
-                    createdTime, \
-                    modifiedTime, \
-                    `status`, \
-                    currentWorkerHostname, \
-                    currentWorker \
-                ) VALUES(NULL, ?, ?, ?, ?, ?) \
-                RETURNING jobId;',
-                (ts, ts, JobStatus.Pending, '', 0)
+        return (await self.new_jobs([request]))[0]
+
+    async def new_jobs(self, requests: List[JobRequest]) -> List[JobId]:
+        # serialized before taking the write lock;
+        jobs = [
+            (
+                [
+                    (i, worker_arg.workerType, worker_arg.model_dump_json(), to_json(None))
+                    for i, worker_arg in enumerate(request.jobWorkers)
+                ],
+                list(request.tags.items())
             )
-            job_id = JobId((await cur.fetchall())[0][0])
-
-            worker_tuples = []
-            for i, worker_arg in enumerate(request.jobWorkers):
-                worker_tuples.append((
-                    job_id,
-                    i,
-                    worker_arg.workerType,
-                    worker_arg.model_dump_json(),
-                    to_json(None)
-                ))
-            await cur.executemany(
-                'INSERT INTO jobWorker( \
-                    jobId, \
-                    workerIndex, \
-                    workerType, \
-                    workerArgument, \
-                    workerResult \
-                ) VALUES(?, ?, ?, ?, ?);',
-                worker_tuples
-            )
-
-            tag_tuples = []
-            for tagKey in request.tags:
-                tag_tuples.append((
-                    job_id,
-                    tagKey,
-                    request.tags[tagKey]
-                ))
-            await cur.executemany(
-                'INSERT INTO jobTag( \
-                    jobId, \
-                    tagKey, \
-                    tagValue \
-                ) VALUES(?, ?, ?);',
-                tag_tuples
-            )
-
-            return job_id
-
-    _update_sql_script = """
-    UPDATE jobWorker SET
-        workerResult=?
-    WHERE
-        jobId=? AND workerIndex=?;
-    """
+            for request in requests
+        ]
+        job_ids = []
+        # one transaction, the batch is created whole or not at all;
+        async with self._write() as db:
+            ts = _now_iso()
+            for worker_rows, tag_rows in jobs:
+                rows = await db.execute_fetchall(
+                    _SQL_INSERT_JOB_DIGEST,
+                    (ts, ts, JobStatus.Pending, '', 0)
+                )
+                job_id = JobId(rows[0][0])
+                await db.executemany(
+                    _SQL_INSERT_JOB_WORKER,
+                    [(job_id, *row) for row in worker_rows]
+                )
+                await db.executemany(
+                    _SQL_INSERT_JOB_TAG,
+                    [(job_id, *row) for row in tag_rows]
+                )
+                job_ids.append(job_id)
+        return job_ids
 
     async def update_job(self, request: JobUpdateRequest) -> Tuple[JobId, str] | None:
         deliverable = request.deliverable
@@ -311,32 +475,19 @@ class SchedulerBackend:
             nextAvailable = True
 
         ret = None
-        async with self._db_conn.cursor() as cur:
+        # serialized before taking the write lock;
+        result = None if yielded else deliverable.model_dump_json()
+        async with self._write() as db:
+            # one timestamp for every statement of the update;
+            ts = _now_iso()
             if not yielded:
-                ts = datetime.now(UTC).isoformat()
-                params = (
-                    deliverable.model_dump_json(),
-                    request.jobId,
-                    request.workerIndex
-                )
-                await cur.execute(
-                    self._update_sql_script,
-                    params
+                await db.execute(
+                    _SQL_UPDATE_WORKER_RESULT,
+                    (result, request.jobId, request.workerIndex)
                 )
 
-            await cur.execute(
-                "UPDATE jobDigest SET \
-                    `status`=?, \
-                    currentWorkerHostname=?, \
-                    currentWorker=?, \
-                    modifiedTime=? \
-                WHERE \
-                    jobId=? AND \
-                    `status`=? AND \
-                    currentWorkerHostname=? AND \
-                    currentWorker=? AND \
-                    modifiedTime<? \
-                ;",
+            await db.execute(
+                _SQL_ADVANCE_JOB,
                 (
                     status, '', nextWorkerIndex, ts,
                     request.jobId, JobStatus.InProgress,
@@ -345,43 +496,44 @@ class SchedulerBackend:
                 )
             )
             if nextAvailable:
-                await cur.execute(
-                    "SELECT workerType FROM jobWorker \
-                    WHERE \
-                        jobId=? AND \
-                        workerIndex=? \
-                    ;",
+                nextType = await db.execute_fetchall(
+                    _SQL_GET_WORKER_TYPE,
                     (request.jobId, nextWorkerIndex)
                 )
-                nextType = await cur.fetchall()
                 if len(nextType) != 0:
                     ret = [request.jobId, nextType[0][0]]
                 else:
-                    await cur.execute(
-                        "UPDATE jobDigest SET \
-                            `status`=? \
-                        WHERE \
-                            jobId=? \
-                        ;",
+                    await db.execute(
+                        _SQL_FINISH_JOB,
                         (JobStatus.Finished, request.jobId)
                     )
 
-        await self._db_conn.commit()
         return ret
 
     async def abort_job(self, jobId: JobId):
-        async with self._db_conn.cursor() as cur:
-            await cur.execute(
-                'UPDATE jobDigest SET \
-                    `status`=? \
-                WHERE \
-                    jobId=? AND `currentWorkerHostname`=? AND \
-                    (`status`=? OR `status`=?) \
-                ;',
+        async with self._write() as db:
+            cur = await db.execute(
+                _SQL_ABORT_JOB,
                 (JobStatus.Aborted, jobId, '', JobStatus.Pending, JobStatus.Waiting)
             )
             return (cur.rowcount == 1)
 
+    async def _fetch_page(self, page_sql: str, count_sql: str, params: tuple, skip: int, page_size: int) -> Tuple[list, int]:
+        # page rows carry the total in a trailing COUNT(*) OVER() column;
+        async with self._read() as db:
+            rows = await db.execute_fetchall(page_sql, (*params, page_size, skip))
+            if len(rows) != 0:
+                return [row[:-1] for row in rows], rows[0][-1]
+            # past the last page there is no row to carry it;
+            return [], (await db.execute_fetchall(count_sql, params))[0][0]
+
+    async def _fetch_counted_page(self, page_sql: str, count_sql: str, params: tuple, skip: int, page_size: int) -> Tuple[list, int]:
+        # the total from its own COUNT, the page from an indexed LIMIT;
+        async with self._read() as db:
+            total = (await db.execute_fetchall(count_sql, params))[0][0]
+            rows = await db.execute_fetchall(page_sql, (*params, page_size, skip))
+        return rows, total
+
     async def mount_apis(self, app: FastAPI):
         @app.get('/jobs')
         async def get_jobs(
@@ -389,70 +541,55 @@ class SchedulerBackend:
             skip: Annotated[int, Query(ge=0)]=0,
             pageSize: Annotated[int, Query(ge=0, le=500)]=20
         ) -> PaginatedResult[JobDigest]:
-            async with self._db_conn.cursor() as cur:
-                await cur.execute(
-                    "SELECT COUNT(*) FROM jobDigest"
-                )
-                total = (await cur.fetchall())[0][0]
-
-                await cur.execute(
-                    f"SELECT * FROM jobDigest ORDER BY {sortBy} DESC LIMIT ? OFFSET ?",
-                    (pageSize, skip)
-                )
-                digestTuples = await cur.fetchall()
-                digests = map(DigestTupleToModel, digestTuples)
-                digests = list[JobDigest](digests)
-                digests.sort(key=KEY_EXTRACTOR[sortBy], reverse=True)
-
-                return PaginatedResult[JobDigest](
-                    page=digests,
-                    pageSize=len(digests),
-                    total=total,
-                    offsetNextPage=skip + len(digests)
-                )
+            digestTuples, total = await self._fetch_counted_page(
+                _SQL_GET_JOBS_PAGE[sortBy],
+                _SQL_COUNT_JOBS,
+                (), skip, pageSize
+            )
+            # sortBy is a SortingModes literal, the ORDER BY already ranks the page;
+            digests = list[JobDigest](map(DigestTupleToModel, digestTuples))
+
+            return _json_response(PaginatedResult[JobDigest](
+                page=digests,
+                pageSize=len(digests),
+                total=total,
+                offsetNextPage=skip + len(digests)
+            ))
         
         @app.get('/jobs/{jobId}')
         async def get_job(
-            jobId: Annotated[str, Path(pattern=JobIDRegex)]
+            jobId: JobIDPath
         ) -> JobContext | None:
             return await self.get_job(jobId)
 
         @app.get('/jobs/{jobId}/log')
         async def get_job_log(
-            jobId: Annotated[str, Path(pattern=JobIDRegex)],
+            jobId: JobIDPath,
             skip: Annotated[int, Query(ge=0)]=0,
             pageSize: Annotated[int, Query(ge=0, le=500)]=20
         ) -> PaginatedResult[JobLog]:
-            jobId = JobId(jobId)
-            async with self._db_conn.cursor() as cur:
-                await cur.execute(
-                    "SELECT COUNT(*) FROM jobLog WHERE jobId=?",
-                    (jobId, )
-                )
-                total = (await cur.fetchall())[0][0]
-                await cur.execute(
-                    "SELECT * FROM jobLog WHERE jobId=? ORDER BY timeStamp DESC LIMIT ? OFFSET ?",
-                    (jobId, pageSize, skip)
-                )
-                logs = list[JobLog](map(JobLogTupleToModel, await cur.fetchall()))
-                return PaginatedResult[JobLog](
-                    page=logs,
-                    pageSize=len(logs),
-                    offsetNextPage=skip + len(logs),
-                    total=total
-                )
+            rows, total = await self._fetch_page(
+                _SQL_GET_JOB_LOG_PAGE,
+                _SQL_COUNT_JOB_LOG,
+                (jobId, ), skip, pageSize
+            )
+            logs = list[JobLog](map(JobLogTupleToModel, rows))
+            return _json_response(PaginatedResult[JobLog](
+                page=logs,
+                pageSize=len(logs),
+                offsetNextPage=skip + len(logs),
+                total=total
+            ))
 
         @app.get('/jobs/{jobId}/tags')
         async def get_job_tags(
-            jobId: Annotated[str, Path(pattern=JobIDRegex)]
+            jobId: JobIDPath
         ) -> Dict[str, str]:
-            jobId = JobId(jobId)
-            async with self._db_conn.cursor() as cur:
-                await cur.execute(
-                    "SELECT * FROM jobTag WHERE jobId=?",
+            async with self._read() as db:
+                tagKVpairs = await db.execute_fetchall(
+                    _SQL_GET_JOB_TAGS,
                     (jobId, )
                 )
-                tagKVpairs = await cur.fetchall()
                 tags = dict[str, str]()
                 for kv_pair in tagKVpairs:
                     tags[kv_pair[1]] = kv_pair[2]
@@ -460,16 +597,14 @@ class SchedulerBackend:
  
         @app.get('/jobs/{jobId}/tags/{tagKey}')
         async def get_job_tag_value_by_key(
-            jobId: Annotated[str, Path(pattern=JobIDRegex)],
+            jobId: JobIDPath,
             tagKey: Annotated[str, Path()]
         ) -> str:
-            jobId = JobId(jobId)
-            async with self._db_conn.cursor() as cur:
-                await cur.execute(
-                    "SELECT * FROM jobTag WHERE jobId=? AND tagKey=?",
+            async with self._read() as db:
+                tagKVpairs = await db.execute_fetchall(
+                    _SQL_GET_JOB_TAG,
                     (jobId, tagKey)
                 )
-                tagKVpairs = await cur.fetchall()
                 if len(tagKVpairs) == 0:
                     return None
                 else:
@@ -477,46 +612,33 @@ class SchedulerBackend:
 
         @app.post('/jobs/{jobId}/tags/{tagKey}')
         async def update_job_tag_value_by_key(
-            jobId: Annotated[str, Path(pattern=JobIDRegex)],
+            jobId: JobIDPath,
             tagKey: Annotated[str, Path()],
             tagValue: Annotated[str, Query()]
         ) -> None:
-            async with self._db_conn.cursor() as cur:
-                await cur.execute(
-                    "DELETE FROM jobTag WHERE \
-                        jobId=? AND tagKey=? \
-                    ;",
-                    (jobId, tagKey)
-                )
-                await cur.execute(
-                    "INSERT INTO jobTag(jobId, tagKey, tagValue) \
-                    VALUES(?, ?, ?) \
-                    ;",
+            async with self._write() as db:
+                await db.execute(
+                    _SQL_UPSERT_JOB_TAG,
                     (jobId, tagKey, tagValue)
                 )
-            await self._db_conn.commit()
 
         @app.get('/tags')
         async def get_tags(
             skip: Annotated[int, Query(ge=0)]=0,
             pageSize: Annotated[int, Query(ge=0, le=500)]=20
         ) -> PaginatedResult[str]:
-            async with self._db_conn.cursor() as cur:
-                await cur.execute(
-                    "SELECT COUNT(DISTINCT tagKey) FROM jobTag;"
-                )
-                total = (await cur.fetchall())[0][0]
-                await cur.execute(
-                    "SELECT DISTINCT tagKey FROM jobTag ORDER BY tagKey ASC LIMIT ? OFFSET ?;",
-                    (pageSize, skip)
-                )
-                tags = list(map(lambda x: x[0], await cur.fetchall()))
-                return PaginatedResult[str](
-                    page=tags,
-                    pageSize=pageSize,
-                    offsetNextPage=skip + len(tags),
-                    total=total
-                )
+            rows, total = await self._fetch_counted_page(
+                _SQL_GET_TAG_KEYS_PAGE,
+                _SQL_COUNT_TAG_KEYS,
+                (), skip, pageSize
+            )
+            tags = list(map(lambda x: x[0], rows))
+            return _json_response(PaginatedResult[str](
+                page=tags,
+                pageSize=pageSize,
+                offsetNextPage=skip + len(tags),
+                total=total
+            ))
 
         @app.get('/search')
         async def search(
@@ -525,90 +647,88 @@ class SchedulerBackend:
             skip: Annotated[int, Query(ge=0)]=0,
             pageSize: Annotated[int, Query(ge=0, le=500)]=20
         ) -> PaginatedResult[Tuple[JobId, str, str]]:
-            async with self._db_conn.cursor() as cur:
-                if tagValue is None:
-                    await cur.execute(
-                        "SELECT COUNT(*) FROM jobTag WHERE tagKey=? ORDER BY jobId DESC LIMIT ? OFFSET ?;",
-                        (tagKey, pageSize, skip)
-                    )
-                    total = (await cur.fetchall())[0][0]
-                    await cur.execute(
-                        "SELECT * FROM jobTag WHERE tagKey=? ORDER BY jobId DESC LIMIT ? OFFSET ?;",
-                        (tagKey, pageSize, skip)
-                    )
-                else:
-                    await cur.execute(
-                        "SELECT COUNT(*) FROM jobTag WHERE tagKey=? AND tagValue=? ORDER BY jobId DESC LIMIT ? OFFSET ?;",
-                        (tagKey, tagValue, pageSize, skip)
-                    )
-                    total = (await cur.fetchall())[0][0]
-                    await cur.execute(
-                        "SELECT * FROM jobTag WHERE tagKey=? AND tagValue=? ORDER BY jobId DESC LIMIT ? OFFSET ?;",
-                        (tagKey, tagValue, pageSize, skip)
-                    )
-                tagKVpairs = await cur.fetchall()
-                page = list(map(lambda row: (JobId(row[0]), row[1], row[2]), tagKVpairs))
-                return PaginatedResult[Tuple[JobId, str, str]](
-                    page=page,
-                    pageSize=len(page),
-                    offsetNextPage=skip + len(page),
-                    total=total
+            if tagValue is None:
+                tagKVpairs, total = await self._fetch_page(
+                    _SQL_SEARCH_KEY_PAGE,
+                    _SQL_COUNT_SEARCH_KEY,
+                    (tagKey, ), skip, pageSize
                 )
+            else:
+                tagKVpairs, total = await self._fetch_page(
+                    _SQL_SEARCH_KEY_VALUE_PAGE,
+                    _SQL_COUNT_SEARCH_KEY_VALUE,
+                    (tagKey, tagValue), skip, pageSize
+                )
+            page = list(map(lambda row: (JobId(row[0]), row[1], row[2]), tagKVpairs))
+            return _json_response(PaginatedResult[Tuple[JobId, str, str]](
+                page=page,
+                pageSize=len(page),
+                offsetNextPage=skip + len(page),
+                total=total
+            ))
 
         @app.get('/system/displays/systemLog')
         async def display_system_log(
             skip: Annotated[int, Query(ge=0)]=0,
             pageSize: Annotated[int, Query(ge=0, le=500)]=20
         ) -> PaginatedResult[SystemLog]:
-            async with self._db_conn.cursor() as cur:
-                await cur.execute("SELECT COUNT(*) FROM systemLog")
-                total = (await cur.fetchall())[0][0]
-                await cur.execute(
-                    "SELECT * FROM systemLog ORDER BY timeStamp DESC LIMIT ? OFFSET ?;",
-                    (pageSize, skip)
-                )
-                logs = list[SystemLog](map(SystemLogTupleToModel, await cur.fetchall()))
-                return PaginatedResult[SystemLog](
-                    page=logs,
-                    pageSize=len(logs),
-                    offsetNextPage=skip + len(logs),
-                    total=total
-                )
+            rows, total = await self._fetch_counted_page(
+                _SQL_GET_SYSTEM_LOG_PAGE,
+                _SQL_COUNT_SYSTEM_LOG,
+                (), skip, pageSize
+            )
+            logs = list[SystemLog](map(SystemLogTupleToModel, rows))
+            return _json_response(PaginatedResult[SystemLog](
+                page=logs,
+                pageSize=len(logs),
+                offsetNextPage=skip + len(logs),
+                total=total
+            ))
 
         @app.get('/system/displays/jobLog')
         async def display_job_log(
             skip: Annotated[int, Query(ge=0)]=0,
             pageSize: Annotated[int, Query(ge=0, le=500)]=20
         ) -> PaginatedResult[JobLog]:
-            async with self._db_conn.cursor() as cur:
-                await cur.execute("SELECT COUNT(*) FROM jobLog")
-                total = (await cur.fetchall())[0][0]
-                await cur.execute(
-                    "SELECT * FROM jobLog ORDER BY timeStamp DESC LIMIT ? OFFSET ?;",
-                    (pageSize, skip)
-                )
-                logs = list[JobLog](map(JobLogTupleToModel, await cur.fetchall()))
-                return PaginatedResult[JobLog](
-                    page=logs,
-                    pageSize=len(logs),
-                    offsetNextPage=skip + len(logs),
-                    total=total
-                )
+            rows, total = await self._fetch_counted_page(
+                _SQL_GET_ALL_JOB_LOG_PAGE,
+                _SQL_COUNT_ALL_JOB_LOG,
+                (), skip, pageSize
+            )
+            logs = list[JobLog](map(JobLogTupleToModel, rows))
+            return _json_response(PaginatedResult[JobLog](
+                page=logs,
+                pageSize=len(logs),
+                offsetNextPage=skip + len(logs),
+                total=total
+            ))
 
     async def start(self):
-        self._db_conn = await aiosqlite.connect(self._backend_conn_str)
+        # one writer; WAL lets the pooled readers run beside it;
+        self._writer = await self._connect()
         self._storage_backend = await create_storage_backend(self.config.storage)
-        async with self._db_conn.cursor() as cur:
-            await cur.execute(
+        async with self._write() as db:
+            result = await db.execute_fetchall(
                 'SELECT name FROM sqlite_master WHERE type=? AND name=?;',
                 ('table', 'jobDigest')
             )
-            result = await cur.fetchall()
         # if it's necessary to build the table structures;
         if len(result) == 0:
             await self._create_db()
+        async with self._write() as db:
+            await db.executescript(_SQL_CREATE_INDEXES)
         await self._shutdown_left_over_jobs()
+        self._log_flusher_task = asyncio.create_task(self._log_flusher())
+        for _ in range(READ_POOL_SIZE):
+            self._read_pool.put_nowait(await self._connect(read_only=True))
 
     async def stop(self):
-        await self._db_conn.commit()
-        await self._db_conn.close()
+        # the log consumers are cancelled by now; refuse late rows so they're
+        # requeued, and drain the pending ones before the connections go;
+        self._log_closing = True
+        self._log_queue.put_nowait(None)
+        await self._log_flusher_task
+        while not self._read_pool.empty():
+            await self._read_pool.get_nowait().close()
+        await self._writer.commit()
+        await self._writer.close()
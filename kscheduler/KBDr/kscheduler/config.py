@@ -1,13 +1,15 @@
 from typing import List, Dict, Any
 from pydantic import BaseModel, ConfigDict, Field
-from KBDr.kcore import StorageProviderConfig
+from KBDr.kcore import AnyStorageProviderConfig
 
 class SchedulerConfig(BaseModel):
-    model_config = ConfigDict(extra='allow')
+    # read once at start-up and fixed for the process, the system config
+    # replies are cached on that;
+    model_config = ConfigDict(extra='allow', frozen=True)
 
     deploymentName: str
     allowedOrigins: List[str]
-    storage: StorageProviderConfig
+    storage: AnyStorageProviderConfig
     workerConfigs: Dict[str, Dict[Any, Any]]
     dbPath: str
     listen: str=Field('0.0.0.0')
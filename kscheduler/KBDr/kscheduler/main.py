@@ -1,11 +1,12 @@
 # main.py
 import uvicorn, os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from pydantic import BaseModel
 from .scheduler_server import SchedulerServer
 from fastapi.middleware.cors import CORSMiddleware
 from .config import SchedulerConfig
+from KBDr.kcore import model_dump_json_bytes
 import aio_pika
 
 class SystemInfo(BaseModel):
@@ -19,9 +20,12 @@ class SchedulerApplication:
         self._scheduler_server: SchedulerServer = None
 
     async def mount_apis(self, app: FastAPI):
-        @app.get('/system/info')
-        async def get_system_info() -> SystemInfo:
-            return SystemInfo(deploymentName=self._config.deploymentName)
+        # fixed for the process, serialized once;
+        system_info = model_dump_json_bytes(SystemInfo(deploymentName=self._config.deploymentName))
+
+        @app.get('/system/info', response_model=SystemInfo)
+        async def get_system_info() -> Response:
+            return Response(system_info, media_type='application/json')
 
     def main(self):
         @asynccontextmanager
@@ -34,10 +38,18 @@ class SchedulerApplication:
             await self.mount_apis(app)
             await self._scheduler_server.start()
             yield
+            # stop taking logs, flush the queued rows, then let their acks go out;
+            await self._scheduler_server.stop_log_consumers()
             await self._backend.stop()
+            await mq_conn.close()
         self._api = FastAPI(lifespan=lifespan)
         self._api.add_middleware(
             CORSMiddleware,
             allow_origins=self._config.allowedOrigins
         )
-        uvicorn.run(self._api, host=self._config.listen, port=self._config.listenPort)
+        # one process: the backend owns the single sqlite writer and aborts
+        # left-over jobs on start, so it can't be forked into workers;
+        uvicorn.run(
+            self._api, host=self._config.listen, port=self._config.listenPort,
+            loop='uvloop', http='httptools'
+        )
@@ -1,9 +1,13 @@
 from KBDr.kcore import *
-from typing import Annotated
-from fastapi import FastAPI, Path, Query, HTTPException
-from .utils import JobIDRegex
+import asyncio, msgspec, traceback
+from typing import Annotated, List
+from fastapi import FastAPI, Query, HTTPException
+from .utils import JobIDPath, system_log_decoder, job_log_decoder
 from .backend import SchedulerBackend
 
+PUBLISH_CHANNEL_COUNT = 4
+LOG_PREFETCH_COUNT = 256
+
 class SchedulerServer(SchedulerServerBase):
 
     def __init__(self, mq_conn: str, backend: SchedulerBackend):
@@ -12,13 +16,17 @@ class SchedulerServer(SchedulerServerBase):
         self._worker_control: WorkerControl = None
 
     async def enqueue_job(self, job_id: JobId, worker_type: str):
-        await self._message_chan.default_exchange.publish(
+        # a job sticks to one channel, so its messages stay in order;
+        chan = self._publish_chans[job_id % PUBLISH_CHANNEL_COUNT]
+        await chan.default_exchange.publish(
             Message(body=str(job_id).encode('utf-8')),
             routing_key=worker_type
         )
 
     async def get_system_config(self, request: SystemConfigRequest) -> SystemConfig:
-        return SystemConfig(
+        # the RPC server keeps the serialized reply per worker type for good, the
+        # SchedulerConfig is frozen; the parts are validated with it already;
+        return SystemConfig.model_construct(
             storage=self._backend.config.storage,
             workerConfig=self._backend.config.workerConfigs.get(request.workerType, None),
             deploymentName=self._backend.config.deploymentName
@@ -35,26 +43,24 @@ class SchedulerServer(SchedulerServerBase):
 
     async def mount_apis(self, app: FastAPI):
         @app.post('/jobs/{jobId}/abort')
-        async def abort_job(jobId: Annotated[str, Path(pattern=JobIDRegex)]) -> None:
-            job_context = await self._backend.get_job(jobId)
-            jobId = JobId(jobId)
-            if job_context is None:
+        async def abort_job(jobId: JobIDPath) -> None:
+            job_digest = await self._backend.get_job_digest(jobId)
+            if job_digest is None:
                 raise HTTPException(404, 'Job not found')
-            if job_context.status == JobStatus.Aborted:
+            if job_digest.status == JobStatus.Aborted:
                 return
             if not await self._backend.abort_job(jobId):
                 await self._worker_control.abort_job(
-                    job_context.currentWorkerHostname,
+                    job_digest.currentWorkerHostname,
                     JobAbortRequest(jobId=jobId)
                 )
 
         @app.post('/jobs/{jobId}/restart')
         async def restart_job(
-            jobId: Annotated[str, Path(pattern=JobIDRegex)],
+            jobId: JobIDPath,
             restartFrom: Annotated[int, Query(ge=-1)]=-1
         ) -> None:
             job_context = await self._backend.get_job(jobId)
-            jobId = JobId(jobId)
             if job_context is None:
                 raise HTTPException(404, 'Job not found')
             if job_context.status not in (JobStatus.Aborted, JobStatus.Finished):
@@ -72,25 +78,55 @@ class SchedulerServer(SchedulerServerBase):
             await self.enqueue_job(job_id, request.jobWorkers[0].workerType)
             return job_id
 
+        @app.post('/newJobs')
+        async def new_jobs(requests: List[JobRequest]) -> List[JobId]:
+            job_ids = await self._backend.new_jobs(requests)
+            await asyncio.gather(*(
+                self.enqueue_job(job_id, request.jobWorkers[0].workerType)
+                for job_id, request in zip(job_ids, requests)
+            ))
+            return job_ids
+
+    async def _insert_log(self, message: AbstractIncomingMessage, decoder: msgspec.json.Decoder, insert):
+        try:
+            log = decoder.decode(message.body)
+        except msgspec.DecodeError:
+            # malformed, redelivering won't help;
+            traceback.print_exc()
+            await message.reject()
+            return
+        # acked once the row is committed, a failed write goes back to the queue;
+        async with message.process(requeue=True):
+            await insert(log)
+
     async def _insert_system_log(self, message: AbstractIncomingMessage):
-        async with message.process():
-            await self._backend.insert_system_log(SystemLog.model_validate_json(message.body))
-    
+        await self._insert_log(message, system_log_decoder, self._backend.insert_system_log)
+
     async def _insert_job_log(self, message: AbstractIncomingMessage):
-        async with message.process():
-            await self._backend.insert_job_log(JobLog.model_validate_json(message.body))
+        await self._insert_log(message, job_log_decoder, self._backend.insert_job_log)
 
     async def start(self):
         self._worker_control_chan = await self._mq_conn.channel()
-        self._message_chan = await self._mq_conn.channel()
+        # fire-and-forget enqueues, no broker ack round trip per job;
+        self._publish_chans = [
+            await self._mq_conn.channel(publisher_confirms=False)
+            for _ in range(PUBLISH_CHANNEL_COUNT)
+        ]
 
         self._log_chan = await self._mq_conn.channel()
+        # in-flight log messages share the flusher's batches, let the broker run ahead;
+        await self._log_chan.set_qos(prefetch_count=LOG_PREFETCH_COUNT)
         self._system_log_queue = await self._log_chan.get_queue('scheduler.insert_system_log')
         self._job_log_queue = await self._log_chan.get_queue('scheduler.insert_job_log')
-        await self._system_log_queue.consume(self._insert_system_log)
-        await self._job_log_queue.consume(self._insert_job_log)
+        self._system_log_consumer = await self._system_log_queue.consume(self._insert_system_log)
+        self._job_log_consumer = await self._job_log_queue.consume(self._insert_job_log)
 
         self._worker_control = WorkerControl(self._worker_control_chan)
         await self._worker_control.start()
 
         await super(SchedulerServer, self).start()
+
+    async def stop_log_consumers(self):
+        # no new deliveries; the ones in flight still ack once they're flushed;
+        await self._system_log_queue.cancel(self._system_log_consumer)
+        await self._job_log_queue.cancel(self._job_log_consumer)
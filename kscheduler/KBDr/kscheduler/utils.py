@@ -1,9 +1,31 @@
 # utils.py
-from typing import Literal, Generic, TypeVar, List
-from pydantic import BaseModel
+from typing import Annotated, Literal, Generic, TypeVar, List
+from datetime import datetime
+from pydantic import AfterValidator, BaseModel
+from fastapi import Path
+import msgspec
 
-from KBDr.kcore import PaginatedResult
+from KBDr.kcore import JobId, PaginatedResult
 
 JobIDRegex = "^[0-9a-f]{8}$"
+# shared by every /jobs/{jobId} route, handlers get the parsed JobId;
+JobIDPath = Annotated[str, Path(pattern=JobIDRegex), AfterValidator(JobId._from_hex)]
 SortingModes = Literal['modifiedTime', 'createdTime']
 
+# wire mirrors of SystemLog/JobLog for the MQ log path; content stays as the
+# raw JSON slice and goes into the table as is;
+class SystemLogMessage(msgspec.Struct):
+    timeStamp: datetime
+    workerType: str
+    workerHostname: str
+    content: msgspec.Raw
+
+class JobLogMessage(msgspec.Struct):
+    timeStamp: datetime
+    jobId: Annotated[str, msgspec.Meta(pattern=JobIDRegex)]
+    workerType: str
+    workerHostname: str
+    content: msgspec.Raw
+
+system_log_decoder = msgspec.json.Decoder(SystemLogMessage)
+job_log_decoder = msgspec.json.Decoder(JobLogMessage)
@@ -1,57 +1,170 @@
 # gcp.py
-from KBDr.kcore import run_async, JobExceptionError, JobContext
-from KBDr.kcore.storage_backends.storage_gcs import GCSStorageProviderConfig
-from KBDr.kclient_models.kvmmanager import kVMManagerWorker
+import os, re, asyncio, hashlib, time
+from datetime import datetime
+from KBDr.kcore import run_async, JobExceptionError, JobResource
+from KBDr.kcore.storage_backends.storage_gcs import GCSStorageBackend
 from .vm_task import VMTask
 
-from google.cloud.compute import ImagesClient, Image
+from google.cloud.compute import ImagesClient, Image, GlobalSetLabelsRequest
 
-async def image_cleanup(vm_task: VMTask):
+IMAGE_READY_TIMEOUT = 600
+IMAGE_POLL_INTERVAL = 10
+IMAGE_CREATE_ATTEMPTS = 2
+OPERATION_POLL_MAX_INTERVAL = 30
+# shared images are collected once nobody has used them for this long;
+IMAGE_GC_IDLE_HOURS = int(os.environ.get('KVMMANAGER_IMAGE_GC_IDLE_HOURS', 72))
+IMAGE_GC_INTERVAL = 3600
+IMAGE_TOUCH_INTERVAL = 3600
+IMAGE_LAST_USED_LABEL = 'kgym-last-used'
+
+# one client and credential lookup per process, shared by every job;
+_IMAGES_CLIENT = None
+_PROJECT_ID = None
+_LAST_GC = None
+
+def _get_images_client() -> tuple[ImagesClient, str]:
+    global _IMAGES_CLIENT, _PROJECT_ID
+    if _IMAGES_CLIENT is None:
+        from google.auth import default
+        _, _PROJECT_ID = default()
+        _IMAGES_CLIENT = ImagesClient()
+    return _IMAGES_CLIENT, _PROJECT_ID
+
+async def _wait_operation(operation, error_name: str):
+    # there is no async compute client; poll with backoff instead of parking
+    # a pool thread in operation.result for minutes;
+    deadline = time.monotonic() + IMAGE_READY_TIMEOUT
+    interval = 1
+    while not await run_async(operation.done):
+        if time.monotonic() > deadline:
+            raise JobExceptionError(error_name, 'Timed out waiting for the image operation')
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, OPERATION_POLL_MAX_INTERVAL)
+
+async def _wait_image_ready(image_client: ImagesClient, project_id: str, image_name: str) -> Image | None:
+    # another job is building the same image, wait for it; None if it failed or is gone;
     from google.api_core.exceptions import NotFound
-    from google.auth import default
+    deadline = time.monotonic() + IMAGE_READY_TIMEOUT
+    while True:
+        try:
+            image = await run_async(image_client.get, image=image_name, project=project_id)
+        except NotFound:
+            return None
+        if image.status == 'READY':
+            return image
+        if image.status == 'FAILED':
+            return None
+        if time.monotonic() > deadline:
+            raise JobExceptionError('kvmmanager.GCE.ImageCreationError', f'Image {image_name} is {image.status}')
+        await asyncio.sleep(IMAGE_POLL_INTERVAL)
 
-    _, project_id = default()
-    image_client = ImagesClient()
-    image_name = vm_task.syz_crush_cfg['vm']['gce_image']
+async def _delete_image(image_client: ImagesClient, project_id: str, image_name: str):
+    from google.api_core.exceptions import NotFound
     try:
-        existing_image = await run_async(image_client.get, image=image_name, project=project_id)
+        operation = await run_async(image_client.delete, image=image_name, project=project_id)
     except NotFound:
         return
-    operation = await run_async(image_client.delete, project=project_id, image=image_name)
-    deletion_result = await run_async(operation.result, timeout=600)
+    await _wait_operation(operation, 'kvmmanager.GCE.ImageDeletionError')
     if operation.error_code:
         raise JobExceptionError('kvmmanager.GCE.ImageDeletionError', f'GCP Error Code: {operation.error_code}, {operation.error_message}')
 
-async def prepare_gce_image(vm_task: VMTask, vm_image_uri: str):
-    from google.api_core.exceptions import NotFound
-    from google.auth import default
+def _image_last_used(image: Image) -> float:
+    # images without the label count from their creation;
+    if IMAGE_LAST_USED_LABEL in image.labels:
+        return float(image.labels[IMAGE_LAST_USED_LABEL])
+    return datetime.fromisoformat(image.creation_timestamp).timestamp()
 
-    _, project_id = default()
-    storage_config: GCSStorageProviderConfig = vm_task._worker.system_config.storage
+async def _touch_image(image_client: ImagesClient, project_id: str, image: Image):
+    # keeps a shared image away from the GC, relabelled at most once per interval;
+    from google.api_core.exceptions import GoogleAPICallError
+    now = int(time.time())
+    if now - _image_last_used(image) < IMAGE_TOUCH_INTERVAL:
+        return
+    request = GlobalSetLabelsRequest(
+        labels={**image.labels, IMAGE_LAST_USED_LABEL: str(now)},
+        label_fingerprint=image.label_fingerprint
+    )
+    try:
+        await run_async(
+            image_client.set_labels, project=project_id,
+            resource=image.name, global_set_labels_request_resource=request
+        )
+    except GoogleAPICallError:
+        # a concurrent touch changed the fingerprint, it did the same;
+        pass
 
-    image_url = vm_image_uri
-    image_name = f'{vm_task._worker.system_config.deploymentName}-job-{vm_task.job_id}'
+def _list_idle_images(image_client: ImagesClient, project_id: str, deployment_name: str, keep_name: str) -> list[str]:
+    pattern = re.compile(re.escape(deployment_name) + '-[0-9a-f]{16}')
+    cutoff = time.time() - IMAGE_GC_IDLE_HOURS * 3600
+    return [
+        image.name for image in image_client.list(project=project_id)
+        if pattern.fullmatch(image.name) and image.name != keep_name
+        and image.status != 'PENDING' and _image_last_used(image) < cutoff
+    ]
 
-    image_client = ImagesClient()
+async def gc_images(vm_task: VMTask, image_client: ImagesClient, project_id: str, keep_name: str):
+    # shared images outlive their jobs, drop the idle ones; once per interval per process;
+    global _LAST_GC
+    if _LAST_GC is not None and time.monotonic() - _LAST_GC < IMAGE_GC_INTERVAL:
+        return
+    from google.api_core.exceptions import GoogleAPICallError
+    _LAST_GC = time.monotonic()
     try:
-        existing_image = await run_async(image_client.get, image=image_name, project=project_id)
-    except NotFound:
-        existing_image = None
-    
-    vm_task.image_cleanup_handler = image_cleanup
-
-    if existing_image is not None:
-        operation = await run_async(image_client.delete, project=project_id, image=image_name)
-        deletion_result = await run_async(operation.result, timeout=600)
-        if operation.error_code:
-            raise JobExceptionError('kvmmanager.GCE.ImageDeletionError', f'GCP Error Code: {operation.error_code}, {operation.error_message}')
-
-    image = Image()
-    image.raw_disk.source = image_url
-    image.name = image_name
-    operation = image_client.insert(project=project_id, image_resource=image)
-    creation_result = await run_async(operation.result, timeout=600)
-    if operation.error_code:
-        raise JobExceptionError('kvmmanager.GCE.ImageCreationError', f'GCP Error Code: {operation.error_code}, {operation.error_message}')
+        image_names = await run_async(
+            _list_idle_images, image_client, project_id,
+            vm_task._worker.system_config.deploymentName, keep_name
+        )
+    except GoogleAPICallError as e:
+        # the job has its image, a failed collection waits for the next run;
+        await vm_task.report_job_log(f'Failed to list images for collection: {e}')
+        return
+    results = await asyncio.gather(*(
+        _delete_image(image_client, project_id, image_name) for image_name in image_names
+    ), return_exceptions=True)
+    for image_name, result in zip(image_names, results):
+        if isinstance(result, Exception):
+            await vm_task.report_job_log(f'Failed to collect idle image {image_name}: {result}')
+        else:
+            await vm_task.report_job_log(f'Collected idle image {image_name}')
 
+async def prepare_gce_image(vm_task: VMTask, vm_image: JobResource):
+    from google.api_core.exceptions import Conflict, NotFound
+
+    image_client, project_id = _get_images_client()
+    storage_backend: GCSStorageBackend = vm_task.storage_backend
+
+    # named after the content, jobs on the same kernel image share the GCE image
+    # and leave it in place for the next one, gc_images drops it once idle;
+    generation = await storage_backend.get_resource_generation(vm_image.key)
+    digest = hashlib.sha256(f'{vm_image.storageUri}#{generation}'.encode('utf-8')).hexdigest()[:16]
+    image_name = f'{vm_task._worker.system_config.deploymentName}-{digest}'
     vm_task.syz_crush_cfg['vm']['gce_image'] = image_name
+
+    for _ in range(IMAGE_CREATE_ATTEMPTS):
+        try:
+            await run_async(image_client.get, image=image_name, project=project_id)
+        except NotFound:
+            image = Image()
+            image.raw_disk.source = vm_image.storageUri
+            image.name = image_name
+            image.labels = { IMAGE_LAST_USED_LABEL: str(int(time.time())) }
+            try:
+                operation = await run_async(image_client.insert, project=project_id, image_resource=image)
+            except Conflict:
+                # another job inserted it meanwhile, wait on theirs;
+                pass
+            else:
+                await _wait_operation(operation, 'kvmmanager.GCE.ImageCreationError')
+                if operation.error_code:
+                    raise JobExceptionError('kvmmanager.GCE.ImageCreationError', f'GCP Error Code: {operation.error_code}, {operation.error_message}')
+                break
+        image = await _wait_image_ready(image_client, project_id, image_name)
+        if image is not None:
+            await _touch_image(image_client, project_id, image)
+            break
+        # a failed image would stand for this kernel image for good, redo it;
+        await _delete_image(image_client, project_id, image_name)
+    else:
+        raise JobExceptionError('kvmmanager.GCE.ImageCreationError', f'Image {image_name} failed to build')
+
+    await gc_images(vm_task, image_client, project_id, image_name)
@@ -1,59 +1,95 @@
 # syzkaller.py
+import asyncio, os, re
 import asyncio.subprocess as asp
 from KBDr.kcore import JobExceptionError
 
-async def prepare_syzkaller(syzkaller_path: str, checkout_name: str, rollback: bool, latest_tag: str='ca620dd8f97f5b3a9134b687b5584203019518fb') -> str:
-    # not necessary to rollback if it's already preparing ca620dd8f97f5b3a9134b687b5584203019518fb;
-    rollback = rollback and (checkout_name != latest_tag)
+# kept under .git, git clean -fxd leaves it alone;
+LAST_BUILD_MEMO = os.path.join('.git', 'kgym-last-build')
+_COMMIT_ID = re.compile('^[0-9a-f]{40}$')
 
-    # make clean;
-    proc = await asp.create_subprocess_exec(
-        'git', 'clean', '-fxd', stdin=asp.DEVNULL, stderr=asp.DEVNULL,
-        stdout=asp.DEVNULL, cwd=syzkaller_path
-    )
-    code = await proc.wait()
-    if code != 0:
-        raise JobExceptionError('kvmmanager.SyzkallerBuildError', 'Failed to make clean the syzkaller folder')
-    # git fetch --all;
+async def _run(cwd: str, *args: str) -> int:
     proc = await asp.create_subprocess_exec(
-        'git', 'fetch', '--all', stdin=asp.DEVNULL, stderr=asp.DEVNULL,
-        stdout=asp.DEVNULL, cwd=syzkaller_path
+        *args, stdin=asp.DEVNULL, stderr=asp.DEVNULL,
+        stdout=asp.DEVNULL, cwd=cwd
     )
-    code = await proc.wait()
+    return await proc.wait()
+
+def _read_memo(path: str) -> str:
+    try:
+        with open(path, 'r') as fp:
+            return fp.read()
+    except FileNotFoundError:
+        return ''
+
+def _write_memo(path: str, content: str):
+    with open(path, 'w') as fp:
+        fp.write(content)
+
+def _remove_memo(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+async def _fetch(syzkaller_path: str, checkout_name: str) -> bool:
+    # a commit id already present can't change, no need to hit the network;
+    if _COMMIT_ID.match(checkout_name) and \
+        await _run(syzkaller_path, 'git', 'cat-file', '-e', f'{checkout_name}^{{commit}}') == 0:
+        return False
+    # git fetch --all; refs and objects only, the work tree is left alone;
+    code = await _run(syzkaller_path, 'git', 'fetch', '--all')
     if code != 0:
         raise JobExceptionError('kvmmanager.SyzkallerBuildError', f'Failed to fetch the latest syzkaller')
-    # git pull;
+    return True
+
+async def _pull(syzkaller_path: str, latest_tag: str):
+    # git pull; merges into the work tree, so only after the clean;
     org = 'origin'
     if latest_tag == 'master':
         org = 'upstream'
-    proc = await asp.create_subprocess_exec(
-        'git', 'pull', org, latest_tag, stdin=asp.DEVNULL, stderr=asp.DEVNULL,
-        stdout=asp.DEVNULL, cwd=syzkaller_path
-    )
-    code = await proc.wait()
+    code = await _run(syzkaller_path, 'git', 'pull', org, latest_tag)
     if code != 0:
         raise JobExceptionError('kvmmanager.SyzkallerBuildError', f'Failed to pull the latest syzkaller at {latest_tag}')
-    # git checkout {checkout_name};
-    proc = await asp.create_subprocess_exec(
-        'git', 'checkout', checkout_name, stdin=asp.DEVNULL, stderr=asp.DEVNULL,
-        stdout=asp.DEVNULL, cwd=syzkaller_path
+
+async def _clean(syzkaller_path: str):
+    # make clean;
+    code = await _run(syzkaller_path, 'git', 'clean', '-fxd')
+    if code != 0:
+        raise JobExceptionError('kvmmanager.SyzkallerBuildError', 'Failed to make clean the syzkaller folder')
+
+async def prepare_syzkaller(syzkaller_path: str, checkout_name: str, rollback: bool, latest_tag: str='ca620dd8f97f5b3a9134b687b5584203019518fb') -> str:
+    # not necessary to rollback if it's already preparing ca620dd8f97f5b3a9134b687b5584203019518fb;
+    rollback = rollback and (checkout_name != latest_tag)
+
+    # the tree still holds the build of this very commit; the memo is a few
+    # bytes on local disk, read inline;
+    memo_path = os.path.join(syzkaller_path, LAST_BUILD_MEMO)
+    if _COMMIT_ID.match(checkout_name) and _read_memo(memo_path) == checkout_name:
+        return checkout_name
+    _remove_memo(memo_path)
+
+    # the clean touches the work tree, the fetch only .git;
+    _, fetched = await asyncio.gather(
+        _clean(syzkaller_path),
+        _fetch(syzkaller_path, checkout_name)
     )
-    code = await proc.wait()
+    if fetched:
+        await _pull(syzkaller_path, latest_tag)
+    # git checkout {checkout_name};
+    code = await _run(syzkaller_path, 'git', 'checkout', checkout_name)
     if code != 0:
         raise JobExceptionError('kvmmanager.SyzkallerBuildError', f'Failed to checkout syzkaller:{checkout_name}')
     # make target;
-    proc = await asp.create_subprocess_exec(
-        'make', 'target', '-j8', stdin=asp.DEVNULL, stderr=asp.DEVNULL,
-        stdout=asp.DEVNULL, cwd=syzkaller_path
-    )
-    code = await proc.wait()
+    code = await _run(syzkaller_path, 'make', 'target', '-j8')
     if code == 0:
         proc = await asp.create_subprocess_exec(
             'git', 'rev-parse', 'HEAD', stdin=asp.DEVNULL, stderr=asp.DEVNULL,
             stdout=asp.PIPE, cwd=syzkaller_path
         )
         commit_id, _ = await proc.communicate()
-        return commit_id.decode('utf-8').strip()
+        commit_id = commit_id.decode('utf-8').strip()
+        _write_memo(memo_path, commit_id)
+        return commit_id
     if not rollback:
         raise JobExceptionError('kvmmanager.SyzkallerBuildError', f'Failed to build syzkaller:{checkout_name}')
     # rollback;
@@ -1,13 +1,16 @@
 # vm_task.py
-import os, aiofiles, json, signal
+import os, aiofiles, aiofiles.os, asyncio, json, signal
 import asyncio.subprocess as asp
 from .utils import *
-from functools import reduce
 
-from KBDr.kcore import TaskBase, run_async, JobExceptionError
+from KBDr.kcore import TaskBase, JobExceptionError, JobResource
 from KBDr.kclient_models.kvmmanager import *
 from KBDr.kclient_models.kbuilder import kBuilderResult
 
+CRASH_UPLOAD_CONCURRENCY = 16
+LOG_SCAN_CHUNK_SIZE = 1 << 20
+FAILED_TO_SET_UP = b'failed to set up instance'
+
 class VMTask(TaskBase):
 
     pending_result: kVMManagerResult | None=None
@@ -78,7 +81,7 @@ class VMTask(TaskBase):
             'count': self.ninstance,
             'machine_type': self.vm_type
         }
-        await prepare_gce_image(self, self.vm_image.storageUri)
+        await prepare_gce_image(self, self.vm_image)
         await self.report_job_log('GCE image prepared')
 
     async def prepare_qemu(self):
@@ -109,25 +112,32 @@ class VMTask(TaskBase):
             self.crush_proc.send_signal(signal.SIGINT)
             await self.report_job_log('Sent SIGINT to syz-crush for job cancellation')
             await self.crush_proc.wait()
-        # clean up image;
-        if self.image_cleanup_handler:
-            await self.image_cleanup_handler(self)
 
     async def collect_crashes(self):
         crash_dir = os.path.join(self.cwd, 'crashes')
-        crashes: list[Crash] = []
 
-        if not await run_async(os.path.exists, crash_dir):
-            return crashes
-        crash_hashes = await run_async(os.listdir, crash_dir)
+        # one scandir per directory;
+        try:
+            with await aiofiles.os.scandir(crash_dir) as it:
+                crash_hashes = [entry.name for entry in it]
+        except FileNotFoundError:
+            return []
+
+        # crashes are collected concurrently, uploads bounded;
+        sem = asyncio.Semaphore(CRASH_UPLOAD_CONCURRENCY)
 
-        for crash_idx, crash_hash in enumerate(crash_hashes):
-            crash_incidents = list[CrashIncident]()
+        async def _submit(key: str, path: str):
+            async with sem:
+                return await self.submit_resource(key, path)
+
+        async def _collect_crash(crash_idx: int, crash_hash: str) -> Crash:
             hash_dir = os.path.join(crash_dir, crash_hash)
             async with aiofiles.open(os.path.join(hash_dir, 'description'), 'r', encoding='utf-8') as fp:
                 crash_description = await fp.read()
             crash_description = crash_description.strip()
-            crash_files = await run_async(os.listdir, hash_dir)
+            # one listing per hash, the uploads reuse its entry paths;
+            with await aiofiles.os.scandir(hash_dir) as it:
+                crash_files = {entry.name: entry for entry in it}
             max_id = 0
             while max_id <= self.argument.reproducer.nInstance:
                 log_max_id = f'log{max_id}'
@@ -135,50 +145,60 @@ class VMTask(TaskBase):
                     max_id += 1
                 else:
                     break
-            # [0, max_id);
-            for nid in range(0, max_id):
-                incident = CrashIncident()
-                log_file = os.path.join(hash_dir, f'log{nid}')
-                report_file = os.path.join(hash_dir, f'report{nid}')
 
-                if f'log{nid}' in crash_files:
-                    incident.log = await self.submit_resource(f'{crash_idx}/log{nid}', log_file)
-                if f'report{nid}' in crash_files:
-                    incident.report = await self.submit_resource(f'{crash_idx}/report{nid}', report_file)
+            async def _collect_artifact(name: str) -> JobResource | None:
+                entry = crash_files.get(name)
+                if entry is None:
+                    return None
+                return await _submit(f'{crash_idx}/{name}', entry.path)
 
-                crash_incidents.append(incident)
+            async def _collect_incident(nid: int) -> CrashIncident:
+                log, report = await asyncio.gather(
+                    _collect_artifact(f'log{nid}'),
+                    _collect_artifact(f'report{nid}')
+                )
+                return CrashIncident(log=log, report=report)
+
+            # [0, max_id);
+            crash_incidents = await asyncio.gather(*map(_collect_incident, range(0, max_id)))
 
-            crashes.append(Crash(
+            return Crash(
                 crashId=crash_idx,
                 title=crash_description,
                 crashType='special' if crash_description in SPECIAL_CRASHES else 'crash',
                 incidents=crash_incidents
-            ))
-        return crashes
+            )
+
+        return list(await asyncio.gather(*(
+            _collect_crash(crash_idx, crash_hash)
+            for crash_idx, crash_hash in enumerate(crash_hashes)
+        )))
 
     async def collect_image_ability(self):
-        failed_to_setup_cnt = 0
-        async with aiofiles.open(self.syz_crush_log_path, 'r') as fp:
-            while ln := await fp.readline():
-                if 'failed to set up instance' in ln:
-                    failed_to_setup_cnt += 1
-        self.pending_result.imageAbility = 'normal'
         if len(self.crashes) == 0:
-            # no crash;
+            # no crash, the log can't change the verdict;
             self.pending_result.imageAbility = 'normal'
-        elif failed_to_setup_cnt == self.ninstance:
+            return
+        # count in binary chunks, carrying a needle's length minus one over
+        # each boundary so no occurrence is split or counted twice;
+        failed_to_setup_cnt = 0
+        tail = b''
+        async with aiofiles.open(self.syz_crush_log_path, 'rb') as fp:
+            while chunk := await fp.read(LOG_SCAN_CHUNK_SIZE):
+                buf = tail + chunk
+                failed_to_setup_cnt += buf.count(FAILED_TO_SET_UP)
+                tail = buf[-(len(FAILED_TO_SET_UP) - 1):]
+        if failed_to_setup_cnt == self.ninstance:
             # all died;
-            self.pending_result.imageAbility = 'error'
-        elif len(self.crashes) == self.ninstance - failed_to_setup_cnt:
-            # living machines all crashed;
-            if reduce(lambda a, b: a and b, map(lambda x: x.crashType == 'special', self.crashes)):
-                self.pending_result.imageAbility = 'warning'
-            else:
-                # at least a normal crash;
-                self.pending_result.imageAbility = 'normal'
+            image_ability = 'error'
+        elif len(self.crashes) == self.ninstance - failed_to_setup_cnt \
+            and all(crash.crashType == 'special' for crash in self.crashes):
+            # living machines all crashed, none of them a normal crash;
+            image_ability = 'warning'
         else:
-            # there's a dp didn't crash;
-            self.pending_result.imageAbility = 'normal'
+            # at least a normal crash, or there's a dp didn't crash;
+            image_ability = 'normal'
+        self.pending_result.imageAbility = image_ability
 
     async def collect_result(self) -> List[Crash]:
         self.crashes = await self.collect_crashes()
@@ -186,11 +206,11 @@ class VMTask(TaskBase):
         return self.crashes
 
     async def on_task(self) -> kVMManagerResult:
-        self.argument = kVMManagerArgument.model_validate(self.argument.model_dump())
+        # the fields are plain JSON values already, a shallow dict is enough;
+        self.argument = kVMManagerArgument.model_validate(dict(self.argument))
         self.pending_result = kVMManagerResult()
         self.crush_proc = None
         self.syzkaller_path = os.environ['KVMMANAGER_SYZKALLER_PATH']
-        self.image_cleanup_handler = None
 
         await self.prepare_resources()
 
@@ -207,14 +227,13 @@ class VMTask(TaskBase):
 
         await self.prepare_reproducer()
 
-        async def _no_matching_vm_provider():
+        if self.vm_provider == 'gce':
+            await self.prepare_gce()
+        elif self.vm_provider == 'qemu':
+            await self.prepare_qemu()
+        else:
             raise JobExceptionError('kvmmanager.InvalidVMProviderError', f'Unsupported VM provider \'{self.vm_provider}\'')
 
-        await ({
-            'gce': self.prepare_gce,
-            'qemu': self.prepare_qemu
-        }.get(self.vm_provider, _no_matching_vm_provider))()
-
         self.syz_crush_cfg_path = os.path.join(self.cwd, 'crush.cfg')
         async with aiofiles.open(self.syz_crush_cfg_path, 'w') as fp:
             await fp.write(json.dumps(self.syz_crush_cfg))
@@ -222,17 +241,21 @@ class VMTask(TaskBase):
 
         await self.report_job_log('Invoking syz-crush')
 
-        # run syz_crush;
-        self.crush_proc = await asp.create_subprocess_exec(
-            '/usr/local/bin/syz-crush',
-            '-config', self.syz_crush_cfg_path,
-            '-restart_time', self.restart_time,
-            '-infinite=false',
-            self.reproducer_path, cwd=self.cwd,
-            stdout=await run_async(open, self.syz_crush_log_path, 'w', encoding='utf-8'),
-            stderr=asp.STDOUT,
-            stdin=asp.DEVNULL
-        )
+        # run syz_crush; the child writes the raw fd, ours is closed once it's inherited;
+        log_fd = os.open(self.syz_crush_log_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            self.crush_proc = await asp.create_subprocess_exec(
+                '/usr/local/bin/syz-crush',
+                '-config', self.syz_crush_cfg_path,
+                '-restart_time', self.restart_time,
+                '-infinite=false',
+                self.reproducer_path, cwd=self.cwd,
+                stdout=log_fd,
+                stderr=asp.STDOUT,
+                stdin=asp.DEVNULL
+            )
+        finally:
+            os.close(log_fd)
         await self.crush_proc.wait()
         self.crush_proc = None
 